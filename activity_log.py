@@ -0,0 +1,240 @@
+# activity_log.py
+"""Write-behind buffer for activity_logs.
+
+log_activity() calls made during a request append to an in-process
+buffer instead of committing a row each. A background thread drains the
+buffer with one executemany() per batch, whenever it reaches
+``batch_size`` entries or ``flush_interval`` seconds after the first
+queued entry, and once more at interpreter exit. Entries stay visible in
+pending() until their batch has committed, so readers never miss them.
+When the buffer is full, log() blocks (backpressure) and, if it is still
+full after ``put_timeout``, writes the entry itself: on the request's
+writer connection when the request holds it (joining its transaction if
+one is open), otherwise on the buffer's own.
+
+The buffer writes through a pool of its own rather than the request
+writer pool, so it never waits for a request to finish. A flush takes
+the SQLite write lock (BEGIN IMMEDIATE) before _flush_lock, which then
+covers only the insert, the commit and the dequeue, so readers in
+read_with_pending() don't wait out another writer's transaction.
+"""
+import atexit
+import threading
+import time
+from collections import deque
+
+from flask import current_app, g, has_app_context
+
+from pool import ConnectionPool
+
+MAX_QUEUE = 10000
+BATCH_SIZE = 500
+WRITERS = 2           # buffer connections: the flusher plus an inline write
+FLUSH_INTERVAL = 1.0  # seconds
+PUT_TIMEOUT = 2.0     # seconds log() waits for room before writing inline
+
+INSERT = """
+    INSERT INTO activity_logs (actor_type, actor_id, action, details, timestamp, timestamp_epoch)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+COLUMNS = ("actor_type", "actor_id", "action", "details", "timestamp", "timestamp_epoch")
+
+
+def entry_row(entry):
+    """A buffered entry as a dict keyed like an activity_logs row; its id
+    is None until the entry is flushed."""
+    return {"id": None, **dict(zip(COLUMNS, entry))}
+
+
+class ActivityLogBuffer:
+    """Bounded queue of activity rows flushed by a background thread."""
+
+    def __init__(self, pool, max_queue=MAX_QUEUE, batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL, put_timeout=PUT_TIMEOUT):
+        self.pool = pool
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+
+        self._entries = deque()
+        self._cond = threading.Condition()
+        self._writer_lock = threading.Lock()  # one flush at a time
+        self._flush_lock = threading.Lock()   # commit + dequeue vs. read_with_pending()
+        self._first_at = None
+        self._thread = None
+        self._stopping = False
+
+        self._flushes = 0
+        self._flushed_rows = 0
+        self._flush_total = 0.0
+        self._flush_max = 0.0
+        self._flush_last = 0.0
+        self._blocked = 0
+        self._inline_writes = 0
+        self._errors = 0
+
+    # --- producer side ---
+    def log(self, actor_type, actor_id, action, details, timestamp, timestamp_epoch):
+        entry = (actor_type, actor_id, action, details, timestamp, timestamp_epoch)
+        with self._cond:
+            self._ensure_thread()
+            if len(self._entries) >= self.max_queue:
+                self._blocked += 1
+                deadline = time.monotonic() + self.put_timeout
+                while len(self._entries) >= self.max_queue and not self._stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            if len(self._entries) < self.max_queue and not self._stopping:
+                if not self._entries:
+                    self._first_at = time.monotonic()
+                self._entries.append(entry)
+                if len(self._entries) >= self.batch_size:
+                    self._cond.notify_all()
+                return
+            self._inline_writes += 1
+        conn = g.get("db_conn") if has_app_context() else None
+        if conn is not None and not conn.pool.readonly:
+            # Our own connections would wait on the write lock this request holds
+            joined = conn.in_transaction
+            conn.execute(INSERT, entry)
+            if not joined:
+                conn.commit()
+            return
+        self._write([entry])
+
+    def pending(self):
+        """Entries queued or being flushed, oldest first."""
+        with self._cond:
+            return list(self._entries)
+
+    def read_with_pending(self, read):
+        """Call ``read()`` and snapshot pending() with no flush in between,
+        so every entry shows up exactly once in one of the two."""
+        with self._flush_lock:
+            return read(), self.pending()
+
+    # --- consumer side ---
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="activity-log-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    if len(self._entries) >= self.batch_size:
+                        break
+                    if self._entries:
+                        remaining = self._first_at + self.flush_interval - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+                if self._stopping and not self._entries:
+                    return
+            if not self.flush():
+                time.sleep(self.flush_interval)  # back off before retrying
+
+    def flush(self):
+        """Write everything queued so far, one executemany per batch.
+
+        Returns False if a batch failed; it stays queued for the next try.
+        """
+        with self._writer_lock:
+            while True:
+                with self._cond:
+                    batch = [self._entries[i] for i in range(min(self.batch_size, len(self._entries)))]
+                if not batch:
+                    return True
+                try:
+                    self._write(batch, dequeue=True)
+                except Exception:
+                    with self._cond:
+                        self._errors += 1
+                    return False
+
+    def _dequeue(self, count):
+        with self._cond:
+            for _ in range(count):
+                self._entries.popleft()
+            self._first_at = time.monotonic() if self._entries else None
+            self._cond.notify_all()
+
+    def _write(self, rows, dequeue=False):
+        start = time.perf_counter()
+        conn = self.pool.acquire()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                with self._flush_lock:
+                    conn.executemany(INSERT, rows)
+                    conn.commit()
+                    if dequeue:
+                        self._dequeue(len(rows))
+            except BaseException:
+                conn.rollback()
+                raise
+        finally:
+            conn.close()
+        elapsed = time.perf_counter() - start
+        with self._cond:
+            self._flushes += 1
+            self._flushed_rows += len(rows)
+            self._flush_total += elapsed
+            self._flush_last = elapsed
+            self._flush_max = max(self._flush_max, elapsed)
+
+    def close(self):
+        """Stop the writer thread after flushing what is queued."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=10)
+        self.flush()
+
+    def stats(self):
+        """Queue depth and flush latency metrics."""
+        with self._cond:
+            return {
+                "queue_depth": len(self._entries),
+                "max_queue": self.max_queue,
+                "flushes": self._flushes,
+                "flushed_rows": self._flushed_rows,
+                "flush_avg_ms": (self._flush_total / self._flushes * 1000) if self._flushes else 0.0,
+                "flush_last_ms": self._flush_last * 1000,
+                "flush_max_ms": self._flush_max * 1000,
+                "blocked": self._blocked,
+                "inline_writes": self._inline_writes,
+                "errors": self._errors,
+            }
+
+
+# -------------------
+# FLASK INTEGRATION
+# -------------------
+def init_app(app):
+    """Buffer activity logging for this app unless ACTIVITY_LOG_BUFFER is False."""
+    if not app.config.get("ACTIVITY_LOG_BUFFER", True):
+        return
+    shared = app.extensions["db_pool"]
+    app.extensions["activity_log"] = ActivityLogBuffer(
+        ConnectionPool(shared.database, size=WRITERS, timeout=shared.timeout),
+        max_queue=app.config.get("ACTIVITY_LOG_MAX_QUEUE", MAX_QUEUE),
+        batch_size=app.config.get("ACTIVITY_LOG_BATCH_SIZE", BATCH_SIZE),
+        flush_interval=app.config.get("ACTIVITY_LOG_FLUSH_INTERVAL", FLUSH_INTERVAL),
+        put_timeout=app.config.get("ACTIVITY_LOG_PUT_TIMEOUT", PUT_TIMEOUT),
+    )
+
+
+def get_buffer():
+    """The current app's buffer, or None (outside a request or disabled)."""
+    if has_app_context():
+        return current_app.extensions.get("activity_log")
+    return None
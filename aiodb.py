@@ -0,0 +1,119 @@
+# aiodb.py
+"""Async database calls on a bounded thread pool.
+
+sqlite3 blocks, so AsyncDatabase runs each call on one of ASYNC_DB_WORKERS
+threads and returns an awaitable. The workers draw from a pool of their
+own, one connection each (read-only when read/write routing is on), so
+they never wait on or starve the request pools. A page built from several independent
+queries gathers them, and they run side by side: SQLite releases the GIL
+while it steps a statement, and WAL readers don't block each other.
+Across the process no more than ASYNC_DB_WORKERS such queries run at
+once, however many requests are gathering.
+
+Flask only runs ``async def`` views with its "async" extra (asgiref),
+which this app doesn't depend on, so views use load() below: it drives
+the gather with asyncio.run() on the request thread, or runs the same
+calls one after another on the request connection when
+ASYNC_DB_WORKERS is 0. Statements run on the workers are merged into
+the request's QueryLog.
+
+ASYNC_DB_WORKERS is 0 by default: the home dashboards' queries are
+sub-millisecond index reads, and handing them to threads costs more
+than running them side by side saves (see bench/dashboards.py). Turn it
+on when composite pages run queries of several milliseconds each.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, g, has_app_context
+
+from db import get_connection
+from instrument import QueryLog
+from pool import ConnectionPool
+
+WORKERS = 0  # off; 4 is a good start when turning it on
+
+
+class AsyncDatabase:
+    """Awaitable calls of ``operation(conn, *args)`` on worker threads."""
+
+    def __init__(self, pool, workers):
+        self.pool = pool
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sqlite-async")
+
+    def _call(self, log, operation, args):
+        conn = self.pool.acquire()
+        conn.query_log = log
+        try:
+            return operation(conn, *args)
+        finally:
+            conn.close()
+
+    async def run(self, operation, *args):
+        """Await ``operation(conn, *args)`` on a worker connection."""
+        parent = g.get("query_log") if has_app_context() else None
+        log = QueryLog(parent.slow_seconds, parent.on_slow) if parent is not None else None
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor, self._call, log, operation, args)
+        finally:
+            if log is not None:
+                parent.merge(log)
+
+    async def fetch_all(self, sql, params=()):
+        return await self.run(fetch_all, sql, params)
+
+    async def fetch_one(self, sql, params=()):
+        return await self.run(fetch_one, sql, params)
+
+    async def fetch_value(self, sql, params=()):
+        return await self.run(fetch_value, sql, params)
+
+    async def gather(self, calls):
+        """Run ``{name: (operation, *args)}`` concurrently; ``{name: result}``."""
+        results = await asyncio.gather(*(self.run(*call) for call in calls.values()))
+        return dict(zip(calls, results))
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.pool.close_all()
+
+
+# Operations for run() and load()
+def fetch_all(conn, sql, params=()):
+    return conn.execute(sql, params).fetchall()
+
+
+def fetch_one(conn, sql, params=()):
+    return conn.execute(sql, params).fetchone()
+
+
+def fetch_value(conn, sql, params=()):
+    """First column of the first row, or None."""
+    row = conn.execute(sql, params).fetchone()
+    return row[0] if row is not None else None
+
+
+# -------------------
+# FLASK INTEGRATION
+# -------------------
+def init_app(app):
+    """Run gathered page queries on ASYNC_DB_WORKERS threads (0 turns it off)."""
+    workers = app.config.get("ASYNC_DB_WORKERS", WORKERS)
+    if not workers:
+        return
+    shared = app.extensions.get("db_readers") or app.extensions["db_pool"]
+    pool = ConnectionPool(shared.database, size=workers, timeout=shared.timeout, readonly=shared.readonly)
+    app.extensions["aiodb"] = AsyncDatabase(pool, workers)
+
+
+def load(calls):
+    """``{name: (operation, *args)}`` -> ``{name: result}`` for a composite
+    page: gathered on the app's AsyncDatabase, or in turn on the request
+    connection without one."""
+    adb = current_app.extensions.get("aiodb")
+    if adb is None:
+        conn = get_connection()
+        return {name: operation(conn, *args) for name, (operation, *args) in calls.items()}
+    return asyncio.run(adb.gather(calls))
@@ -1,12 +1,54 @@
 from flask import Flask, render_template
+import activity_log
+import aiodb
+import deadlines
+import instrument
+import metrics
+import pool
+import profiling
+import prometheus
+import slowlog
+import writer
+from commands import register_commands
+from db import init_db
 from routes.auth import auth_bp
 from routes.dashboard import dashboard_bp
 #from routes.customer import customer_bp
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
     app.secret_key = "supersecretkey"  # 🔑 update this later for production
-    
+    app.config["DATABASE"] = pool.DB_NAME
+    if config:
+        app.config.update(config)
+
+    # One pooled connection per request, returned on teardown
+    pool.init_app(app)
+    # Worker threads that run a page's independent queries concurrently
+    aiodb.init_app(app)
+    # Write-behind buffer for activity logging
+    activity_log.init_app(app)
+    # One thread group-commits the hot request writes
+    writer.init_app(app)
+    # Slow statements with their query plans, then per-request query stats
+    slowlog.init_app(app)
+    instrument.init_app(app)
+    # Request rates and latencies for the monitoring console
+    metrics.init_app(app)
+    # Query time budgets for the report endpoints
+    deadlines.init_app(app)
+    # /metrics for Prometheus, merged across worker processes
+    prometheus.init_app(app)
+    # On-demand and sampled request profiles (registered last so it
+    # covers the view and not the other hooks)
+    profiling.init_app(app)
+
+    # Create tables and apply pending migrations
+    with app.app_context():
+        init_db()
+
+    register_commands(app)
+
     # Register blueprints
     app.register_blueprint(auth_bp, url_prefix="/auth")
     app.register_blueprint(dashboard_bp, url_prefix="/dashboard")
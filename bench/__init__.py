@@ -0,0 +1,2 @@
+# bench/__init__.py
+"""Benchmarks, run as modules from the project root: python -m bench.<name>"""
@@ -0,0 +1,72 @@
+# bench/bulk_insert.py
+"""Insert throughput: one commit per row vs. transaction() vs. executemany.
+
+    python -m bench.bulk_insert --rows 10000
+
+Runs against a throwaway database, never crm_app.db.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from app import create_app
+from db import add_customer, add_customers, get_connection, transaction
+
+
+def _rows(n, tag):
+    return [
+        (f"Customer {tag}{i}", f"{tag}{i}@example.com", f"080{i:08d}", "Lagos", "Female",
+         "1990-01-01", "Engineer", "bench")
+        for i in range(n)
+    ]
+
+
+def per_call_commit(rows):
+    for row in rows:
+        add_customer(*row)
+
+
+def single_transaction(rows):
+    with transaction() as conn:
+        for row in rows:
+            add_customer(*row, conn=conn)
+
+
+def bulk_executemany(rows):
+    add_customers(rows)
+
+
+STRATEGIES = [
+    ("add_customer() per row", per_call_commit),
+    ("transaction() + add_customer(conn=)", single_transaction),
+    ("add_customers() executemany", bulk_executemany),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_bulk.db")
+    app = create_app({"DATABASE": path})
+
+    print(f"\n=== Inserting {args.rows} customers ===")
+    with app.app_context():
+        baseline = None
+        for index, (label, strategy) in enumerate(STRATEGIES):
+            rows = _rows(args.rows, f"s{index}-")
+            start = time.perf_counter()
+            strategy(rows)
+            elapsed = time.perf_counter() - start
+            rate = args.rows / elapsed
+            baseline = baseline or rate
+            print(f"{label:40} {elapsed:8.3f}s {rate:12,.0f} rows/s  x{rate / baseline:.1f}")
+
+        total = get_connection().execute("SELECT COUNT(*) FROM customers").fetchone()[0]
+        print(f"rows written: {total}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+# bench/concurrency.py
+"""Report scans running alongside sustained writes.
+
+    python -m bench.concurrency --customers 20000 --seconds 10 --writers 4 --readers 2
+
+Writer threads POST new transactions and feedback as customers while
+reader threads stream the full transactions CSV and run the users
+report as an admin, all against one app. The run is done on copies of
+the same generated database: with read/write routing (mode=ro readers
+plus the writer), with DB_READ_ROUTING off, and with routing while the
+activity-log buffer is full. In that last run the writers POST to a
+route that writes and then logs, so every log_activity() falls back to
+an inline write while the request holds the writer, and the readers
+also load the admin dashboard, which reads the buffer's pending
+entries. It prints write throughput and latency, scan latency and every
+failed request, and exits non-zero if any request in a routed run hit
+"database is locked" or a PoolTimeout. The DB_READ_ROUTING-off run is
+there for comparison: its deferred transactions are expected to fail
+with "database is locked" under write contention.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from flask import session
+
+from app import create_app
+from bench.generate import ADMIN, CUSTOMER_PASSWORD, checkpoint, generate, prepare_database
+from db import log_activity, transaction
+from pool import writes
+
+WRITES = [
+    ("/dashboard/transactions", {"amount": "19.99", "type": "Product A"}),
+    ("/dashboard/feedbacks", {"message": "Concurrency bench"}),
+]
+SCANS = [
+    ("GET", "/dashboard/download_report/transactions", None),
+    ("POST", "/dashboard/generate_report", {"report_type": "users"}),
+]
+
+# Full-buffer run: a write that logs its activity, plus a buffer that
+# never has room, so every log goes inline
+LOGGED_WRITES = [("/bench/logged_write", {})]
+DASHBOARD_SCANS = SCANS + [("GET", "/dashboard/", None)]
+FULL_BUFFER = {
+    "ACTIVITY_LOG_MAX_QUEUE": 1,
+    "ACTIVITY_LOG_BATCH_SIZE": 10**6,
+    "ACTIVITY_LOG_FLUSH_INTERVAL": 3600,
+    "ACTIVITY_LOG_PUT_TIMEOUT": 0.01,
+}
+MODES = [
+    ("ro readers + writer", {"DB_READ_ROUTING": True}),
+    ("read-write pool", {"DB_READ_ROUTING": False}),
+    ("full activity buffer", dict(FULL_BUFFER, DB_READ_ROUTING=True)),
+]
+
+
+def add_logged_write(app):
+    @app.route("/bench/logged_write", methods=["POST"])
+    @writes
+    def logged_write():
+        customer_id = session["user_id"]
+        with transaction() as conn:
+            conn.execute("INSERT INTO feedback (customer_id, message, status) VALUES (?, ?, 'pending')",
+                         (customer_id, "Logged write"))
+        log_activity("customer", customer_id, "feedback", "Logged write")
+        return "", 204
+
+
+def _login(app, username, password):
+    client = app.test_client()
+    if client.post("/auth/login", data={"username": username, "password": password}).status_code != 302:
+        sys.exit(f"bench login failed for {username}")
+    return client
+
+
+class Run:
+    """Latencies and failures gathered by the worker threads."""
+
+    def __init__(self, seconds):
+        self.deadline = time.perf_counter() + seconds
+        self.lock = threading.Lock()
+        self.writes = []
+        self.scans = []
+        self.errors = Counter()
+
+    def request(self, client, method, path, data, into):
+        start = time.perf_counter()
+        try:
+            response = client.open(path, method=method, data=data)
+            response.get_data()
+            response.close()
+            failure = None if response.status_code < 400 else f"HTTP {response.status_code} {path}"
+        except Exception as exc:
+            failure = f"{type(exc).__name__}: {exc}"
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            if failure:
+                self.errors[failure] += 1
+            else:
+                into.append(elapsed)
+
+
+def _writer(app, run, username, posts):
+    client = _login(app, username, CUSTOMER_PASSWORD)
+    i = 0
+    while time.perf_counter() < run.deadline:
+        path, data = posts[i % len(posts)]
+        run.request(client, "POST", path, data, run.writes)
+        i += 1
+
+
+def _reader(app, run, offset, scans):
+    client = _login(app, *ADMIN)
+    i = offset
+    while time.perf_counter() < run.deadline:
+        method, path, data = scans[i % len(scans)]
+        run.request(client, method, path, data, run.scans)
+        i += 1
+
+
+def _ms(values, q):
+    if len(values) < 2:
+        return values[0] * 1000 if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1] * 1000
+
+
+def measure(database, config, args):
+    app = create_app(dict(config, DATABASE=database, PROPAGATE_EXCEPTIONS=True, SLOW_QUERY_MS=None))
+    full_buffer = "ACTIVITY_LOG_MAX_QUEUE" in config
+    if full_buffer:
+        add_logged_write(app)
+    posts = LOGGED_WRITES if full_buffer else WRITES
+    scans = DASHBOARD_SCANS if full_buffer else SCANS
+    usernames = [f"bench-1234-{i}" for i in range(args.writers)]
+    run = Run(args.seconds)
+    threads = [threading.Thread(target=_writer, args=(app, run, name, posts)) for name in usernames]
+    threads += [threading.Thread(target=_reader, args=(app, run, i, scans)) for i in range(args.readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--customers", type=int, default=20000)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=2)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    template = os.path.join(workdir, "template.db")
+    prepare_database(template)
+    app = create_app({"DATABASE": template, "ACTIVITY_LOG_BUFFER": False})
+    print(f"Generating {args.customers:,} customers...")
+    with app.app_context():
+        generate(args.customers)
+    checkpoint(template)
+
+    failed = 0
+    print(f"\n{args.writers} writers, {args.readers} readers, {args.seconds:g}s each\n")
+    print(f"{'mode':22} {'writes/s':>9} {'write p50':>10} {'write p99':>10} {'scans':>6} {'scan p50':>9} {'errors':>7}")
+    for number, (label, config) in enumerate(MODES):
+        database = os.path.join(workdir, f"mode_{number}.db")
+        shutil.copy(template, database)
+        run = measure(database, config, args)
+        print(f"{label:22} {len(run.writes) / args.seconds:9.1f} {_ms(run.writes, 50):8.1f}ms "
+              f"{_ms(run.writes, 99):8.1f}ms {len(run.scans):6} {_ms(run.scans, 50):7.1f}ms "
+              f"{sum(run.errors.values()):7}")
+        for message, count in run.errors.most_common():
+            print(f"    {count} x {message}")
+            if config["DB_READ_ROUTING"] and ("database is locked" in message or "PoolTimeout" in message):
+                failed += count
+
+    shutil.rmtree(workdir, ignore_errors=True)
+    if failed:
+        sys.exit(f"\n✗ {failed} request(s) failed with 'database is locked' or a PoolTimeout")
+    print("\n✅ No 'database is locked' errors or pool timeouts with routing")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# bench/dashboards.py
+"""Home dashboards with gathered vs. sequential queries.
+
+    python -m bench.dashboards --customers 100000 --requests 200 --clients 1 8
+
+Times the admin and customer home dashboards (GET /dashboard/) on the
+same generated database twice: with the queries gathered on --workers
+aiodb threads (default 4) and run one after another on the request
+connection (ASYNC_DB_WORKERS = 0, the app's default). Each client count
+runs that many threads requesting in a loop, and the wall-clock p50/p95
+per request and throughput are printed for each mode.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+from app import create_app
+from bench.generate import ADMIN, CUSTOMER_PASSWORD, checkpoint, generate, prepare_database
+from bench.routes import Bench
+
+ROLES = ("admin", "customer")
+
+
+def _client(bench, role):
+    # A signed-in test client per thread, as bench.clients are not shared
+    if role == "admin":
+        return bench._login(*ADMIN)
+    username = bench.scalar("SELECT username FROM customers WHERE id = ?", bench.customer_id)
+    return bench._login(username, CUSTOMER_PASSWORD)
+
+
+def measure(bench, role, clients, requests):
+    """Per-request seconds of `requests` GETs spread over `clients` threads."""
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(client, count):
+        mine = []
+        for _ in range(count):
+            start = time.perf_counter()
+            response = client.get("/dashboard/")
+            mine.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise SystemExit(f"/dashboard/ as {role}: HTTP {response.status_code}")
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=worker, args=(_client(bench, role), requests // clients))
+               for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--customers", type=int, default=100000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    database = os.path.join(workdir, "dashboards.db")
+    prepare_database(database)
+    app = create_app({"DATABASE": database, "ACTIVITY_LOG_BUFFER": False})
+    print(f"Generating {args.customers:,} customers...")
+    with app.app_context():
+        generate(args.customers)
+    checkpoint(database)
+
+    modes = {"gathered": args.workers, "sequential": 0}
+    benches = {}
+    for name, workers in modes.items():
+        app = create_app({"DATABASE": database, "ASYNC_DB_WORKERS": workers, "SLOW_QUERY_MS": None})
+        benches[name] = Bench(app, database)
+
+    print(f"\n{'role':9} {'clients':>7} {'mode':11} {'p50 ms':>8} {'p95 ms':>8} {'req/s':>8}")
+    for role in ROLES:
+        for clients in args.clients:
+            for name, bench in benches.items():
+                measure(bench, role, clients, min(args.requests, 20))  # warm up
+                latencies, elapsed = measure(bench, role, clients, args.requests)
+                cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+                print(f"{role:9} {clients:7} {name:11} {cuts[49] * 1000:8.2f} {cuts[94] * 1000:8.2f} "
+                      f"{len(latencies) / elapsed:8.0f}")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
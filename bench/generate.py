@@ -0,0 +1,188 @@
+# bench/generate.py
+"""Deterministic synthetic data for benchmarks.
+
+    python -m bench.generate --customers 100000 --database bench.db
+
+Adds `--customers` customers plus leads, feedback, reminders and
+transactions in proportion (see RATIOS), spread over DAYS days, in
+bulk executemany() chunks that bump each table's data version once, as
+the bulk helpers in db.py do. The same seed and sizes always produce the
+same rows; adding more to the same database needs another --seed. A
+missing database is first given the table schema of crm_app.db, which
+is what the routes are written against.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from app import create_app
+from db import get_connection, transaction
+from routes.auth import hash_password
+from search import name_column
+from timestamps import to_epoch
+from versions import one_bump
+
+SEED = 1234
+CHUNK = 10000
+DAYS = 365
+START = datetime(2025, 1, 1)
+
+# rows per customer
+RATIOS = {"leads": 0.5, "feedback": 1, "reminders": 0.5, "transactions": 3}
+
+# Logins the route benchmark uses
+ADMIN = ("bench_admin", "bench")
+CUSTOMER_PASSWORD = "bench"
+
+TEMPLATE_DB = "crm_app.db"
+BASE_TABLES = ("admins", "staff", "customers", "leads", "feedback", "activity_logs",
+               "reminders", "transactions")
+
+FIRST = ["Ada", "Bola", "Chidi", "Dayo", "Emeka", "Funke", "Gbenga", "Halima", "Ife", "Jide",
+         "Kemi", "Lola", "Musa", "Ngozi", "Obi", "Tunde", "Uche", "Yemi", "Zainab", "Kunle"]
+LAST = ["Adeyemi", "Bello", "Okafor", "Eze", "Ibrahim", "Okoro", "Balogun", "Nwosu", "Lawal", "Ojo"]
+CITIES = ["Lagos", "Abuja", "Ibadan", "Kano", "Enugu", "Port Harcourt"]
+OCCUPATIONS = ["Engineer", "Teacher", "Trader", "Doctor", "Lecturer", "Farmer", "Banker"]
+PRODUCTS = ["Product A", "Product B", "Product C", "Product D"]
+STATUSES = ["pending", "completed", "cancelled"]
+
+
+def _stamp(rng):
+    moment = START + timedelta(seconds=rng.randrange(DAYS * 86400))
+    return moment.strftime("%Y-%m-%d %H:%M:%S"), to_epoch(moment)
+
+
+def _chunks(count, make):
+    for start in range(0, count, CHUNK):
+        yield [make(i) for i in range(start, min(start + CHUNK, count))]
+
+
+def _insert(table, sql, count, make):
+    for rows in _chunks(count, make):
+        with transaction() as conn, one_bump(conn, table):
+            conn.executemany(sql, rows)
+
+
+def generate(customers, seed=SEED):
+    """Add the synthetic rows to the current app's database; returns the
+    row counts per table."""
+    rng = random.Random(seed)
+    conn = get_connection()
+    password = hash_password(CUSTOMER_PASSWORD)
+    counts = {"customers": customers}
+    counts.update({table: int(customers * ratio) for table, ratio in RATIOS.items()})
+
+    with transaction() as conn:
+        conn.execute("""
+            INSERT OR IGNORE INTO admins (username, password, fullname, email, role)
+            VALUES (?, ?, 'Bench Admin', 'bench_admin@example.com', 'admin')
+        """, (ADMIN[0], hash_password(ADMIN[1])))
+
+    def customer(i):
+        first, last = rng.choice(FIRST), rng.choice(LAST)
+        created_at, created_epoch = _stamp(rng)
+        return (f"{first} {last} {seed}-{i}", f"c{seed}-{i}@example.com", f"080{rng.randrange(10**8):08d}",
+                rng.choice(CITIES), rng.choice(["Male", "Female"]), rng.choice(OCCUPATIONS),
+                f"bench-{seed}-{i}", password, "customer", created_at, created_epoch)
+
+    _insert("customers", f"""
+        INSERT INTO customers ({name_column(conn)}, email, phone, address, gender, occupation,
+                               username, password, role, created_at, created_epoch)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, counts["customers"], customer)
+    first_id = conn.execute(
+        "SELECT id FROM customers WHERE username = ?", (f"bench-{seed}-0",)
+    ).fetchone()[0]
+
+    def customer_id():
+        return first_id + rng.randrange(customers)
+
+    def lead(i):
+        return (f"Lead {seed}-{i}", f"l{seed}-{i}@example.com", None, rng.choice(["New", "Contacted", "Won"]),
+                None, _stamp(rng)[0])
+
+    _insert("leads", """
+        INSERT INTO leads (name, email, phone, status, assigned_to, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, counts["leads"], lead)
+
+    def feedback(i):
+        return (customer_id(), f"Feedback {i}", rng.choice(["pending", "resolved"]), None) + _stamp(rng)
+
+    _insert("feedback", """
+        INSERT INTO feedback (customer_id, message, status, handled_by, created_at, created_epoch)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, counts["feedback"], feedback)
+
+    def reminder(i):
+        created_at, created_epoch = _stamp(rng)
+        due = (START + timedelta(days=rng.randrange(DAYS + 30))).strftime("%Y-%m-%d")
+        return (customer_id(), f"Follow up {i}", "Call the customer", due,
+                rng.choice(["pending", "completed"]), created_at, created_epoch)
+
+    _insert("reminders", """
+        INSERT INTO reminders (customer_id, title, description, reminder_date, status, created_at, created_epoch)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, counts["reminders"], reminder)
+
+    def transaction_row(i):
+        return (customer_id(), round(rng.uniform(5, 500), 2), rng.choice(STATUSES),
+                rng.choice(PRODUCTS)) + _stamp(rng)
+
+    _insert("transactions", """
+        INSERT INTO transactions (customer_id, amount, status, type, created_at, created_epoch)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, counts["transactions"], transaction_row)
+
+    return counts
+
+
+def prepare_database(path):
+    """Create `path` with crm_app.db's base tables (no rows); migrations
+    add the rest when the app starts."""
+    if os.path.exists(path) and os.path.getsize(path):
+        return
+    template = sqlite3.connect(TEMPLATE_DB)
+    placeholders = ", ".join("?" * len(BASE_TABLES))
+    schema = [row[0] for row in template.execute(
+        f"SELECT sql FROM sqlite_master WHERE type = 'table' AND name IN ({placeholders})",
+        BASE_TABLES,
+    )]
+    template.close()
+    conn = sqlite3.connect(path)
+    for sql in schema:
+        conn.execute(sql)
+    conn.commit()
+    conn.close()
+
+
+def checkpoint(path):
+    """Fold the WAL into `path`, so copying the file alone copies everything."""
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--customers", type=int, default=100000)
+    parser.add_argument("--database", default="bench.db")
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args()
+
+    prepare_database(args.database)
+    app = create_app({"DATABASE": os.path.abspath(args.database), "ACTIVITY_LOG_BUFFER": False})
+    start = time.perf_counter()
+    with app.app_context():
+        counts = generate(args.customers, args.seed)
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    print(", ".join(f"{table}={count:,}" for table, count in counts.items()))
+    print(f"{total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s) -> {args.database}")
+
+
+if __name__ == "__main__":
+    main()
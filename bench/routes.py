@@ -0,0 +1,278 @@
+# bench/routes.py
+"""Per-route latency and allocation profile through the Flask test client.
+
+    python -m bench.routes --customers 20000 --requests 50
+    python -m bench.routes --save bench/baseline.json
+    python -m bench.routes --compare bench/baseline.json
+
+Builds a throwaway database with bench.generate (or reuses --database),
+exits non-zero if a hot-path query in migrations.HOT_PATH_QUERIES plans
+a full table scan, then times every route in routes/auth.py and routes/dashboard.py and
+prints p50/p95/p99 latency and peak allocation per request. --compare
+flags routes whose latency or allocations grew past --threshold against
+a saved baseline and exits non-zero if any did.
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from app import create_app
+from bench.generate import ADMIN, CUSTOMER_PASSWORD, SEED, generate, prepare_database
+from migrations import query_plan_problems
+
+THRESHOLD = 0.5         # relative growth that counts as a regression
+MIN_DELTA_MS = 1.0      # ignore p95 changes smaller than this
+ALLOC_SAMPLES = 5       # requests per route traced for allocations
+
+
+class Bench:
+    """Logged-in test clients plus a side connection for per-request setup."""
+
+    def __init__(self, app, database):
+        self.app = app
+        self.db = sqlite3.connect(database, isolation_level=None)
+        self.clients = {None: app.test_client()}
+        self.clients["admin"] = self._login(*ADMIN)
+        self.customer_id = self.scalar("SELECT MIN(id) FROM customers WHERE username LIKE 'bench-%'")
+        username = self.scalar("SELECT username FROM customers WHERE id = ?", self.customer_id)
+        self.clients["customer"] = self._login(username, CUSTOMER_PASSWORD)
+        self._profile = None
+
+    def _login(self, username, password):
+        client = self.app.test_client()
+        response = client.post("/auth/login", data={"username": username, "password": password})
+        if response.status_code != 302:
+            sys.exit(f"bench login failed for {username}")
+        client.get("/dashboard/")  # consume the welcome flash
+        return client
+
+    def profile_name(self):
+        """A stored profile to download, taken on first use."""
+        if self._profile is None:
+            response = self.clients["admin"].get("/dashboard/?_profile=1")
+            self._profile = response.headers["X-Profile-Id"]
+        return self._profile
+
+    def scalar(self, sql, *params):
+        return self.db.execute(sql, params).fetchone()[0]
+
+    def insert(self, sql, *params):
+        return self.db.execute(sql, params).lastrowid
+
+    # Fresh rows for routes that delete or change one
+    def new_customer(self, i):
+        return self.insert(
+            "INSERT INTO customers (fullname, email, username, role) VALUES (?, ?, ?, 'customer')",
+            f"Doomed {i}", f"doomed{i}-{time.time_ns()}@example.com", f"doomed{i}-{time.time_ns()}",
+        )
+
+    def new_reminder(self, i):
+        return self.insert(
+            "INSERT INTO reminders (customer_id, title, reminder_date) VALUES (?, ?, '2025-06-01')",
+            self.customer_id, f"Bench reminder {i}",
+        )
+
+
+def _unique(i):
+    return f"{i}-{time.time_ns()}"
+
+
+# (name, client role, method, path or path(bench, i), form data or data(bench, i))
+CASES = [
+    ("home", None, "GET", "/", None),
+    ("auth.login GET", None, "GET", "/auth/login", None),
+    ("auth.login POST", None, "POST", "/auth/login", {"username": ADMIN[0], "password": ADMIN[1]}),
+    ("auth.logout", None, "GET", "/auth/logout", None),
+    ("dashboard admin", "admin", "GET", "/dashboard/", None),
+    ("dashboard customer", "customer", "GET", "/dashboard/", None),
+    ("update_system", "admin", "GET", "/dashboard/update_system", None),
+    ("monitor_system", "admin", "GET", "/dashboard/monitor_system", None),
+    ("monitor_system.json", "admin", "GET", "/dashboard/monitor_system.json", None),
+    ("generate_report profiled", "admin", "GET", "/dashboard/generate_report?_profile=1", None),
+    ("download_profile", "admin", "GET", lambda b, i: f"/dashboard/profiles/{b.profile_name()}", None),
+    ("register_customer", "admin", "GET", "/dashboard/register_customer", None),
+    ("update_customer_profile", "customer", "GET", "/dashboard/update_customer_profile", None),
+    ("track_sales day", "admin", "GET", "/dashboard/track_sales", None),
+    ("track_sales month", "admin", "GET", "/dashboard/track_sales?bucket=month", None),
+    ("updates", "customer", "GET", "/dashboard/updates", None),
+    ("manage_users", "admin", "GET", "/dashboard/manage_users", None),
+    ("manage_users POST", "admin", "POST", "/dashboard/manage_users",
+     lambda b, i: {"username": f"u{_unique(i)}", "password": "pw", "fullname": "Bench User",
+                   "email": f"u{_unique(i)}@example.com", "role": "staff"}),
+    ("edit_user", "admin", "GET", lambda b, i: f"/dashboard/edit_user/customer/{b.customer_id}", None),
+    ("delete_user", "admin", "POST", lambda b, i: f"/dashboard/delete_user/customer/{b.new_customer(i)}", None),
+    ("assign_role", "admin", "GET", "/dashboard/assign_role", None),
+    ("manage_customers", "admin", "GET", "/dashboard/manage_customers", None),
+    ("manage_customers POST", "admin", "POST", "/dashboard/manage_customers",
+     lambda b, i: {"fullname": "Bench Customer", "email": f"c{_unique(i)}@example.com",
+                   "username": f"c{_unique(i)}", "password": "pw"}),
+    ("customer_typeahead", "admin", "GET", "/dashboard/customer_typeahead?q=Ad", None),
+    ("search_customers", "admin", "GET", "/dashboard/search_customers?q=Ngozi+Lagos", None),
+    ("edit_customer", "admin", "GET", lambda b, i: f"/dashboard/edit_customer/{b.customer_id}", None),
+    ("delete_customer", "admin", "GET", lambda b, i: f"/dashboard/delete_customer/{b.new_customer(i)}", None),
+    ("schedule_reminder", "admin", "GET", "/dashboard/schedule_reminder", None),
+    ("schedule_reminder POST", "admin", "POST", "/dashboard/schedule_reminder",
+     lambda b, i: {"customer_id": b.customer_id, "title": "Bench", "description": "",
+                   "reminder_date": "2025-06-01"}),
+    ("complete_reminder", "admin", "GET", lambda b, i: f"/dashboard/complete_reminder/{b.new_reminder(i)}", None),
+    ("delete_reminder", "admin", "GET", lambda b, i: f"/dashboard/delete_reminder/{b.new_reminder(i)}", None),
+    ("generate_report", "admin", "GET", "/dashboard/generate_report", None),
+    ("generate_report customers", "admin", "POST", "/dashboard/generate_report",
+     {"report_type": "customers", "start_date": "2025-03-01", "end_date": "2025-03-31"}),
+    ("generate_report revenue_month", "admin", "POST", "/dashboard/generate_report",
+     {"report_type": "revenue_month"}),
+    ("download_report transactions", "admin", "GET",
+     "/dashboard/download_report/transactions?start_date=2025-03-01&end_date=2025-03-07", None),
+    ("download_report revenue_day", "admin", "GET", "/dashboard/download_report/revenue_day", None),
+    ("feedbacks", "customer", "GET", "/dashboard/feedbacks", None),
+    ("feedbacks POST", "customer", "POST", "/dashboard/feedbacks", {"message": "Bench feedback"}),
+    ("transactions", "customer", "GET", "/dashboard/transactions", None),
+    ("transactions POST", "customer", "POST", "/dashboard/transactions",
+     {"amount": "12.50", "type": "Product A"}),
+]
+
+
+def uncovered_endpoints(bench):
+    """auth/dashboard endpoints that no case exercises."""
+    adapter = bench.app.url_map.bind("localhost")
+    covered = set()
+    for _, _, method, path, _ in CASES:
+        path = path(bench, 0) if callable(path) else path
+        covered.add(adapter.match(path.split("?")[0], method=method)[0])
+    return sorted(
+        rule.endpoint for rule in bench.app.url_map.iter_rules()
+        if rule.endpoint.split(".")[0] in ("auth", "dashboard") and rule.endpoint not in covered
+    )
+
+
+def _request(bench, role, method, path, data, i):
+    client = bench.clients[role]
+    path = path(bench, i) if callable(path) else path
+    data = data(bench, i) if callable(data) else data
+    start = time.perf_counter()
+    response = client.open(path, method=method, data=data)
+    response.get_data()  # drain streamed bodies
+    elapsed = time.perf_counter() - start
+    response.close()
+    if response.status_code >= 400:
+        raise RuntimeError(f"{method} {path} -> {response.status_code}")
+    return elapsed
+
+
+def _percentile(cuts, p):
+    return cuts[p - 1] * 1000
+
+
+def profile(bench, requests, warmup):
+    """{case name: {"p50_ms", "p95_ms", "p99_ms", "alloc_kb"}}"""
+    results = {}
+    for name, role, method, path, data in CASES:
+        for i in range(warmup):
+            _request(bench, role, method, path, data, -i - 1)
+        timings = [_request(bench, role, method, path, data, i) for i in range(requests)]
+        cuts = statistics.quantiles(timings, n=100, method="inclusive")
+
+        peaks = []
+        tracemalloc.start()
+        for i in range(ALLOC_SAMPLES):
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            _request(bench, role, method, path, data, requests + i)
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+        tracemalloc.stop()
+
+        results[name] = {
+            "p50_ms": round(_percentile(cuts, 50), 3),
+            "p95_ms": round(_percentile(cuts, 95), 3),
+            "p99_ms": round(_percentile(cuts, 99), 3),
+            "alloc_kb": round(statistics.median(peaks) / 1024, 1),
+        }
+        row = results[name]
+        print(f"{name:34} {row['p50_ms']:9.2f} {row['p95_ms']:9.2f} {row['p99_ms']:9.2f} {row['alloc_kb']:10.1f}")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Lines describing regressions of `results` against `baseline`."""
+    regressions = []
+    for name, row in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        # p95 from a few dozen samples is noisy, so it gets twice the slack
+        for key, slack in (("p50_ms", threshold), ("p95_ms", threshold * 2)):
+            if row[key] - old[key] > max(MIN_DELTA_MS, old[key] * slack):
+                regressions.append(f"{name}: {key[:3]} {old[key]:.2f} -> {row[key]:.2f} ms")
+        if row["alloc_kb"] > old["alloc_kb"] * (1 + threshold) + 1:
+            regressions.append(f"{name}: alloc {old['alloc_kb']:.1f} -> {row['alloc_kb']:.1f} KB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--customers", type=int, default=20000)
+    parser.add_argument("--database", help="existing bench.generate database to use (it is modified)")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--save", metavar="PATH", help="write the results as a baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    args = parser.parse_args()
+
+    database = args.database
+    if database is None:
+        database = os.path.join(tempfile.mkdtemp(), "bench_routes.db")
+        prepare_database(database)
+    app = create_app({"DATABASE": os.path.abspath(database), "TESTING": True})
+    if args.database is None:
+        print(f"Generating {args.customers:,} customers (seed {SEED})...")
+        with app.app_context():
+            generate(args.customers)
+
+    bench = Bench(app, database)
+    problems = query_plan_problems(bench.db)
+    if problems:
+        for query, plan in problems:
+            print(f"✗ {query}\n    {plan}")
+        sys.exit(f"{len(problems)} hot-path query plan(s) scan a table")
+    for endpoint in uncovered_endpoints(bench):
+        print(f"⚠ no benchmark case for {endpoint}")
+    print(f"\n{'route':34} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'alloc KB':>10}")
+    results = profile(bench, args.requests, args.warmup)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "meta": {
+                    "customers": args.customers if args.database is None else None,
+                    "requests": args.requests,
+                    "python": platform.python_version(),
+                    "sqlite": sqlite3.sqlite_version,
+                    "machine": platform.machine(),
+                },
+                "routes": results,
+            }, f, indent=2)
+            f.write("\n")
+        print(f"\nBaseline written to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["routes"], args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.compare}:")
+            for line in regressions:
+                print(f"  ✗ {line}")
+            sys.exit(1)
+        print(f"\n✅ No regressions against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
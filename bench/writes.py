@@ -0,0 +1,156 @@
+# bench/writes.py
+"""Write latency and throughput under concurrent writers.
+
+    python -m bench.writes --writers 8 32 128 --seconds 5
+
+Each writer thread inserts transactions (with their rollup, version and
+stats triggers) as fast as it can, three ways, each on a fresh copy of
+the same database:
+
+    own connection  every writer opens its own connection and commits,
+                    contending for the SQLite write lock (busy_timeout)
+    writer pool     writers share the single writer connection of
+                    pool.ConnectionPool, one commit each (user-022 setup)
+    write queue     writers submit to writer.WriteQueue, which
+                    group-commits whatever is queued
+
+and prints throughput, p50/p99 latency and failures for each.
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from app import create_app
+from bench.generate import checkpoint, generate, prepare_database
+from pool import PRAGMAS, ConnectionPool
+from timestamps import now_epoch
+from writer import WriteQueue
+
+INSERT = """
+    INSERT INTO transactions (customer_id, amount, status, type, created_at, created_epoch)
+    VALUES (?, ?, 'pending', 'Product A', CURRENT_TIMESTAMP, ?)
+"""
+
+
+def _insert(conn, i):
+    conn.execute(INSERT, (1 + i % 1000, 10 + i % 90, now_epoch()))
+
+
+def own_connection(database):
+    local = threading.local()
+
+    def write(i):
+        conn = getattr(local, "conn", None)
+        if conn is None:
+            conn = local.conn = sqlite3.connect(database, check_same_thread=False)
+            for name, value in PRAGMAS:
+                conn.execute(f"PRAGMA {name}={value}")
+        _insert(conn, i)
+        conn.commit()
+    return write, lambda: None
+
+
+def writer_pool(database):
+    pool = ConnectionPool(database, size=1, timeout=30)
+
+    def write(i):
+        conn = pool.acquire()
+        try:
+            _insert(conn, i)
+            conn.commit()
+        finally:
+            conn.close()
+    return write, pool.close_all
+
+
+def write_queue(database):
+    pool = ConnectionPool(database, size=1, timeout=30)
+    queue = WriteQueue(pool)
+
+    def write(i):
+        queue.run(_insert, i)
+
+    def close():
+        queue.close()
+        print(f"{'':16} group commit: {queue.stats()['batch_avg']:.1f} ops/commit avg, "
+              f"{queue.stats()['batch_max']} max")
+        pool.close_all()
+    return write, close
+
+
+MODES = {"own connection": own_connection, "writer pool": writer_pool, "write queue": write_queue}
+
+
+def measure(make, database, writers, seconds):
+    write, close = make(database)
+    latencies = [[] for _ in range(writers)]
+    errors = Counter()
+    lock = threading.Lock()
+    start_gate = threading.Barrier(writers + 1)
+    deadline = []
+
+    def worker(n):
+        start_gate.wait()
+        i = n
+        while time.perf_counter() < deadline[0]:
+            start = time.perf_counter()
+            try:
+                write(i)
+            except Exception as exc:
+                with lock:
+                    errors[f"{type(exc).__name__}: {exc}"] += 1
+            else:
+                latencies[n].append(time.perf_counter() - start)
+            i += writers
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(writers)]
+    for thread in threads:
+        thread.start()
+    deadline.append(time.perf_counter() + seconds)
+    start_gate.wait()
+    for thread in threads:
+        thread.join()
+    close()
+    return [t for per_thread in latencies for t in per_thread], errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, nargs="+", default=[8, 32, 128])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--customers", type=int, default=1000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    template = os.path.join(workdir, "template.db")
+    prepare_database(template)
+    app = create_app({"DATABASE": template, "ACTIVITY_LOG_BUFFER": False, "WRITE_QUEUE": False})
+    with app.app_context():
+        generate(args.customers)
+    checkpoint(template)
+
+    print(f"\n{'writers':>7} {'mode':16} {'writes/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'failed':>7}")
+    for writers in args.writers:
+        for name, make in MODES.items():
+            database = os.path.join(workdir, "run.db")
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(database + suffix):
+                    os.remove(database + suffix)
+            shutil.copy(template, database)
+            latencies, errors = measure(make, database, writers, args.seconds)
+            cuts = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else [0] * 99
+            print(f"{writers:7} {name:16} {len(latencies) / args.seconds:9.0f} "
+                  f"{cuts[49] * 1000:8.2f} {cuts[98] * 1000:8.2f} {sum(errors.values()):7}")
+            for message, count in errors.most_common(3):
+                print(f"{'':25}{count} x {message}")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
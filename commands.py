@@ -0,0 +1,77 @@
+# commands.py
+import click
+
+from db import get_connection
+from migrations import query_plan_problems
+from principals import hash_plaintext_passwords
+from rollups import rebuild_rollups, verify_rollups
+from routes.auth import hash_password
+from search import rebuild_search
+from stats import count_stats, read_stats, rebuild_stats
+from timestamps import BACKFILL_BATCH, backfill_epochs
+
+
+def register_commands(app):
+    """Maintenance commands, run with `flask --app app <command>`."""
+
+    @app.cli.command("check-query-plans")
+    def check_query_plans():
+        """Fail if a hot-path query does a full table scan."""
+        problems = query_plan_problems(get_connection())
+        for query, plan in problems:
+            click.echo(f"✗ {query}\n    {plan}")
+        if problems:
+            raise click.ClickException(f"{len(problems)} query plan(s) scan a table")
+        click.echo("✅ All hot-path queries use an index.")
+
+    @app.cli.command("rebuild-stats")
+    def rebuild_stats_command():
+        """Check the dashboard counters against real counts and rebuild them."""
+        conn = get_connection()
+        stored, actual = read_stats(conn), count_stats(conn)
+        for name, value in actual.items():
+            if stored[name] != value:
+                click.echo(f"✗ {name}: stored {stored[name]}, actual {value}")
+        rebuild_stats(conn)
+        conn.commit()
+        click.echo("✅ Stats rebuilt: " + ", ".join(f"{k}={v}" for k, v in actual.items()))
+
+    @app.cli.command("hash-passwords")
+    @click.option("--batch-size", default=500, show_default=True)
+    def hash_passwords_command(batch_size):
+        """Hash plaintext customer passwords in batches."""
+        converted = hash_plaintext_passwords(get_connection(), hash_password, batch_size)
+        click.echo(f"✅ Hashed {converted} plaintext customer password(s).")
+
+    @app.cli.command("rebuild-search")
+    def rebuild_search_command():
+        """Rebuild the customer full-text search index."""
+        conn = get_connection()
+        rebuild_search(conn)
+        conn.commit()
+        count = conn.execute("SELECT COUNT(*) FROM customers").fetchone()[0]
+        click.echo(f"✅ Search index rebuilt for {count} customer(s).")
+
+    @app.cli.command("backfill-epochs")
+    @click.option("--batch-size", default=BACKFILL_BATCH, show_default=True)
+    def backfill_epochs_command(batch_size):
+        """Fill missing epoch timestamp columns from the text timestamps."""
+        updated = backfill_epochs(get_connection(), batch_size)
+        click.echo(f"✅ Backfilled epoch timestamps on {updated} row(s).")
+
+    @app.cli.command("verify-rollups")
+    @click.option("--repair", is_flag=True, help="Rebuild the rollup if it has drifted.")
+    def verify_rollups_command(repair):
+        """Compare transactions_daily against a full recompute."""
+        conn = get_connection()
+        mismatches = verify_rollups(conn)
+        for key, stored, actual in mismatches:
+            click.echo(f"✗ {'/'.join(key)}: stored {stored}, actual {actual}")
+        if mismatches and repair:
+            rebuild_rollups(conn)
+            conn.commit()
+            click.echo(f"✅ Rebuilt transactions_daily ({len(mismatches)} bucket(s) were off).")
+        elif mismatches:
+            raise click.ClickException(f"{len(mismatches)} rollup bucket(s) differ; rerun with --repair")
+        else:
+            click.echo("✅ transactions_daily matches the transactions table.")
@@ -0,0 +1,65 @@
+# conditional.py
+"""Conditional GET for pages and exports built from a few tables.
+
+@conditional(tables) computes an ETag from the request URL, the
+signed-in user and the data versions of `tables` (see versions.py), and
+a Last-Modified from their last write. A GET whose If-None-Match still
+matches gets 304 Not Modified before the view runs, so no page queries
+or template rendering happen.
+
+If-Modified-Since alone never gives a 304: it has one-second resolution
+and knows nothing of the user or pending flashes, so it can't tell two
+versions of these per-user pages apart. Last-Modified is still sent.
+"""
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import make_response, request, session
+
+from db import get_connection
+from versions import read_data_state
+
+
+def _etag(versions):
+    # Pending flashes are part of the page the view would render
+    key = repr((request.full_path, session.get("role"), session.get("user_id"),
+                session.get("_flashes"), versions))
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def _not_modified(etag):
+    return bool(request.if_none_match) and request.if_none_match.contains(etag)
+
+
+def conditional(tables):
+    """Answer repeat GETs with 304 while `tables` are unchanged.
+
+    `tables` is a tuple of table names, or a function of the view's
+    keyword arguments returning one (None to skip the check). Requests
+    from signed-out users, and anything but GET/HEAD, always run the view.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            depends_on = tables(**kwargs) if callable(tables) else tables
+            if request.method not in ("GET", "HEAD") or not depends_on or not session.get("role"):
+                return view(*args, **kwargs)
+
+            versions, updated_epoch = read_data_state(get_connection(), depends_on)
+            etag = _etag(versions)
+            last_modified = datetime.fromtimestamp(updated_epoch, timezone.utc)
+            if _not_modified(etag):
+                response = make_response("", 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            # Per-user content: browsers may keep it, but must revalidate
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        return wrapped
+    return decorator
@@ -1,15 +1,25 @@
 # db.py
 import sqlite3
+from contextlib import contextmanager
 from datetime import datetime
 
-DB_NAME = "crm_app.db"
+from activity_log import entry_row, get_buffer
+from migrations import migrate
+from pool import DB_NAME, get_request_connection, pin_to_thread, unpin_from_thread
+from timestamps import backfill_epochs, local_text, to_epoch
+from versions import one_bump
 
 # -------------------
 # CONNECTION HELPERS
 # -------------------
 def get_connection():
-    """Create a database connection."""
-    return sqlite3.connect(DB_NAME)
+    """Return a pooled database connection.
+
+    Inside a request this is the connection bound to the app context, so
+    close() is a no-op and the pool reclaims it on teardown. Outside a
+    request close() returns it to the pool.
+    """
+    return get_request_connection()
 
 
 # -------------------
@@ -132,13 +142,96 @@ def init_db():
 
 
     conn.commit()
+
+    # Indexes and later schema changes
+    migrate(conn)
+    backfill_epochs(conn)
     conn.close()
     print("✅ Database initialized successfully.")
 
 
+# -------------------
+# TRANSACTIONS
+# -------------------
+@contextmanager
+def transaction():
+    """Group writes into one atomic commit.
+
+        with transaction() as conn:
+            add_customer("Ada", conn=conn)
+            log_activity("staff", 1, "created", "Added Ada", conn=conn)
+
+    Commits once on success and rolls back on error. Nested blocks
+    become savepoints inside the outer transaction.
+    """
+    conn = get_connection()
+    depth = conn.tx_depth
+    savepoint = f"tx_{depth}"
+    # Outside a request, keep nested get_connection() calls on this connection
+    owned = not depth and not conn.pinned
+    if owned:
+        pin_to_thread(conn)
+    try:
+        if depth:
+            conn.execute(f"SAVEPOINT {savepoint}")
+        elif not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+    except BaseException:
+        if owned:
+            unpin_from_thread(conn)
+            conn.close()
+        raise
+    conn.tx_depth = depth + 1
+    try:
+        yield conn
+    except BaseException:
+        if depth:
+            conn.execute(f"ROLLBACK TO {savepoint}")
+            conn.execute(f"RELEASE {savepoint}")
+        else:
+            conn.rollback()
+        raise
+    else:
+        if depth:
+            conn.execute(f"RELEASE {savepoint}")
+        else:
+            conn.commit()
+    finally:
+        conn.tx_depth = depth
+        if owned:
+            unpin_from_thread(conn)
+            conn.close()
+
+
+def _execute(query, params=(), conn=None):
+    """Run one write on `conn`, or in its own transaction if none is given."""
+    if conn is not None:
+        return conn.execute(query, params)
+    with transaction() as conn:
+        return conn.execute(query, params)
+
+
+def _executemany(query, rows, conn=None, table=None):
+    """Run a bulk write; `table`'s data version moves once, not per row."""
+    if conn is not None:
+        with one_bump(conn, table):
+            return conn.executemany(query, rows)
+    with transaction() as conn, one_bump(conn, table):
+        return conn.executemany(query, rows)
+
+
+def _with_defaults(row, required, defaults):
+    """Pad a positional row with the trailing defaults it leaves out."""
+    row = tuple(row)
+    return row + defaults[len(row) - required:]
+
+
 # -------------------
 # CRUD HELPERS
 # -------------------
+# Every write helper takes an optional `conn`. Without one it commits on
+# its own; with the connection from `transaction()` it joins that
+# transaction, so a workflow pays for one commit instead of one per call.
 
 # --- Generic Utility ---
 def fetch_all(query, params=()):
@@ -159,15 +252,11 @@ def fetch_one(query, params=()):
 
 
 # --- Admins ---
-def add_admin(username, password, fullname, email, phone=None, role="admin"):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
+def add_admin(username, password, fullname, email, phone=None, role="admin", conn=None):
+    _execute("""
         INSERT INTO admins (username, password, fullname, email, phone, role, created_at)
         VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (username, password, fullname, email, phone, role, datetime.now()))
-    conn.commit()
-    conn.close()
+    """, (username, password, fullname, email, phone, role, local_text(datetime.now())), conn)
 
 def get_admins():
     return fetch_all("SELECT * FROM admins")
@@ -175,46 +264,32 @@ def get_admins():
 def get_admin_by_id(admin_id):
     return fetch_one("SELECT * FROM admins WHERE id = ?", (admin_id,))
 
-def update_admin(admin_id, fullname=None, email=None, phone=None, role=None):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
+def update_admin(admin_id, fullname=None, email=None, phone=None, role=None, conn=None):
+    _execute("""
         UPDATE admins
         SET fullname = COALESCE(?, fullname),
             email = COALESCE(?, email),
             phone = COALESCE(?, phone),
             role = COALESCE(?, role)
         WHERE id = ?
-    """, (fullname, email, phone, role, admin_id))
-    conn.commit()
-    conn.close()
+    """, (fullname, email, phone, role, admin_id), conn)
 
-def delete_admin(admin_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM admins WHERE id = ?", (admin_id,))
-    conn.commit()
-    conn.close()
+def delete_admin(admin_id, conn=None):
+    _execute("DELETE FROM admins WHERE id = ?", (admin_id,), conn)
 
 
 # --- Staff ---
-def add_staff(username, password, fullname, email, phone=None, department=None, role="staff"):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
+def add_staff(username, password, fullname, email, phone=None, department=None, role="staff", conn=None):
+    _execute("""
         INSERT INTO staff (username, password, fullname, email, phone, department, role, created_at)
         VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    """, (username, password, fullname, email, phone, department, role, datetime.now()))
-    conn.commit()
-    conn.close()
+    """, (username, password, fullname, email, phone, department, role, local_text(datetime.now())), conn)
 
 def get_staff():
     return fetch_all("SELECT * FROM staff")
 
-def update_staff(staff_id, fullname=None, email=None, phone=None, department=None, role=None):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
+def update_staff(staff_id, fullname=None, email=None, phone=None, department=None, role=None, conn=None):
+    _execute("""
         UPDATE staff
         SET fullname = COALESCE(?, fullname),
             email = COALESCE(?, email),
@@ -222,36 +297,39 @@ def update_staff(staff_id, fullname=None, email=None, phone=None, department=Non
             department = COALESCE(?, department),
             role = COALESCE(?, role)
         WHERE id = ?
-    """, (fullname, email, phone, department, role, staff_id))
-    conn.commit()
-    conn.close()
+    """, (fullname, email, phone, department, role, staff_id), conn)
 
-def delete_staff(staff_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM staff WHERE id = ?", (staff_id,))
-    conn.commit()
-    conn.close()
+def delete_staff(staff_id, conn=None):
+    _execute("DELETE FROM staff WHERE id = ?", (staff_id,), conn)
 
 
 # --- Customers ---
-def add_customer(name, email=None, phone=None, address=None, gender=None, dob=None, occupation=None, notes=None):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO customers (name, email, phone, address, gender, dob, occupation, notes, created_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (name, email, phone, address, gender, dob, occupation, notes, datetime.now()))
-    conn.commit()
-    conn.close()
+CUSTOMER_INSERT = """
+    INSERT INTO customers (name, email, phone, address, gender, dob, occupation, notes, created_at, created_epoch)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+def add_customer(name, email=None, phone=None, address=None, gender=None, dob=None, occupation=None, notes=None, conn=None):
+    now = datetime.now()
+    text = local_text(now)
+    _execute(CUSTOMER_INSERT, (name, email, phone, address, gender, dob, occupation, notes, text, to_epoch(now)), conn)
+
+def add_customers(rows, conn=None):
+    """Bulk add_customer(): rows are (name, email, ...) tuples in add_customer() order."""
+    now = datetime.now()
+    text = local_text(now)
+    defaults = (None,) * 7
+    stamp = (text, to_epoch(now))
+    return _executemany(
+        CUSTOMER_INSERT, [_with_defaults(row, 1, defaults) + stamp for row in rows],
+        conn, table="customers",
+    ).rowcount
 
 def get_customers():
     return fetch_all("SELECT * FROM customers")
 
-def update_customer(customer_id, name=None, email=None, phone=None, address=None, gender=None, dob=None, occupation=None, notes=None):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
+def update_customer(customer_id, name=None, email=None, phone=None, address=None, gender=None, dob=None, occupation=None, notes=None, conn=None):
+    _execute("""
         UPDATE customers
         SET name = COALESCE(?, name),
             email = COALESCE(?, email),
@@ -262,36 +340,36 @@ def update_customer(customer_id, name=None, email=None, phone=None, address=None
             occupation = COALESCE(?, occupation),
             notes = COALESCE(?, notes)
         WHERE id = ?
-    """, (name, email, phone, address, gender, dob, occupation, notes, customer_id))
-    conn.commit()
-    conn.close()
+    """, (name, email, phone, address, gender, dob, occupation, notes, customer_id), conn)
 
-def delete_customer(customer_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM customers WHERE id = ?", (customer_id,))
-    conn.commit()
-    conn.close()
+def delete_customer(customer_id, conn=None):
+    _execute("DELETE FROM customers WHERE id = ?", (customer_id,), conn)
 
 
 # --- Leads ---
-def add_lead(name, email=None, phone=None, status="New", assigned_to=None):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO leads (name, email, phone, status, assigned_to, created_at)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (name, email, phone, status, assigned_to, datetime.now()))
-    conn.commit()
-    conn.close()
+LEAD_INSERT = """
+    INSERT INTO leads (name, email, phone, status, assigned_to, created_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+def add_lead(name, email=None, phone=None, status="New", assigned_to=None, conn=None):
+    _execute(LEAD_INSERT, (name, email, phone, status, assigned_to, local_text(datetime.now())), conn)
+
+def add_leads(rows, conn=None):
+    """Bulk add_lead(): rows are (name, email, phone, status, assigned_to) tuples."""
+    now = datetime.now()
+    text = local_text(now)
+    defaults = (None, None, "New", None)
+    return _executemany(
+        LEAD_INSERT, [_with_defaults(row, 1, defaults) + (text,) for row in rows],
+        conn, table="leads",
+    ).rowcount
 
 def get_leads():
     return fetch_all("SELECT * FROM leads")
 
-def update_lead(lead_id, name=None, email=None, phone=None, status=None, assigned_to=None):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
+def update_lead(lead_id, name=None, email=None, phone=None, status=None, assigned_to=None, conn=None):
+    _execute("""
         UPDATE leads
         SET name = COALESCE(?, name),
             email = COALESCE(?, email),
@@ -299,73 +377,93 @@ def update_lead(lead_id, name=None, email=None, phone=None, status=None, assigne
             status = COALESCE(?, status),
             assigned_to = COALESCE(?, assigned_to)
         WHERE id = ?
-    """, (name, email, phone, status, assigned_to, lead_id))
-    conn.commit()
-    conn.close()
+    """, (name, email, phone, status, assigned_to, lead_id), conn)
 
-def delete_lead(lead_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM leads WHERE id = ?", (lead_id,))
-    conn.commit()
-    conn.close()
+def delete_lead(lead_id, conn=None):
+    _execute("DELETE FROM leads WHERE id = ?", (lead_id,), conn)
 
 
 # --- Feedback ---
-def add_feedback(customer_id, message, status="Pending", handled_by=None):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO feedback (customer_id, message, status, handled_by, created_at)
-        VALUES (?, ?, ?, ?, ?)
-    """, (customer_id, message, status, handled_by, datetime.now()))
-    conn.commit()
-    conn.close()
+FEEDBACK_INSERT = """
+    INSERT INTO feedback (customer_id, message, status, handled_by, created_at, created_epoch)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+def add_feedback(customer_id, message, status="Pending", handled_by=None, conn=None):
+    now = datetime.now()
+    text = local_text(now)
+    _execute(FEEDBACK_INSERT, (customer_id, message, status, handled_by, text, to_epoch(now)), conn)
+
+def add_feedbacks(rows, conn=None):
+    """Bulk add_feedback(): rows are (customer_id, message, status, handled_by) tuples."""
+    now = datetime.now()
+    text = local_text(now)
+    defaults = ("Pending", None)
+    stamp = (text, to_epoch(now))
+    return _executemany(
+        FEEDBACK_INSERT, [_with_defaults(row, 2, defaults) + stamp for row in rows],
+        conn, table="feedback",
+    ).rowcount
 
 def get_feedback():
     return fetch_all("SELECT * FROM feedback")
 
-def update_feedback(feedback_id, message=None, status=None, handled_by=None):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
+def update_feedback(feedback_id, message=None, status=None, handled_by=None, conn=None):
+    _execute("""
         UPDATE feedback
         SET message = COALESCE(?, message),
             status = COALESCE(?, status),
             handled_by = COALESCE(?, handled_by)
         WHERE id = ?
-    """, (message, status, handled_by, feedback_id))
-    conn.commit()
-    conn.close()
+    """, (message, status, handled_by, feedback_id), conn)
 
-def delete_feedback(feedback_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM feedback WHERE id = ?", (feedback_id,))
-    conn.commit()
-    conn.close()
+def delete_feedback(feedback_id, conn=None):
+    _execute("DELETE FROM feedback WHERE id = ?", (feedback_id,), conn)
 
 
 # --- Activity Logs ---
-def log_activity(actor_type, actor_id, action, details=None):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO activity_logs (actor_type, actor_id, action, details, timestamp)
-        VALUES (?, ?, ?, ?, ?)
-    """, (actor_type, actor_id, action, details, datetime.now()))
-    conn.commit()
-    conn.close()
+ACTIVITY_INSERT = """
+    INSERT INTO activity_logs (actor_type, actor_id, action, details, timestamp, timestamp_epoch)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+def log_activity(actor_type, actor_id, action, details=None, conn=None):
+    """Record an action. Inside a request (and without `conn`) the row goes
+    through the write-behind buffer in activity_log.py rather than
+    committing here."""
+    now = datetime.now()
+    text = local_text(now)
+    buffer = get_buffer() if conn is None else None
+    if buffer is not None:
+        buffer.log(actor_type, actor_id, action, details, text, to_epoch(now))
+        return
+    _execute(ACTIVITY_INSERT, (actor_type, actor_id, action, details, text, to_epoch(now)), conn)
+
+def log_activities(rows, conn=None):
+    """Bulk log_activity(): rows are (actor_type, actor_id, action, details) tuples."""
+    now = datetime.now()
+    text = local_text(now)
+    defaults = (None,)
+    stamp = (text, to_epoch(now))
+    return _executemany(
+        ACTIVITY_INSERT, [_with_defaults(row, 3, defaults) + stamp for row in rows], conn
+    ).rowcount
 
 def get_activity_logs():
-    return fetch_all("SELECT * FROM activity_logs ORDER BY timestamp DESC")
-
-def delete_activity_log(log_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM activity_logs WHERE id = ?", (log_id,))
-    conn.commit()
-    conn.close()
+    """All activity, newest first, as dicts keyed by column."""
+    def read():
+        return fetch_all("SELECT * FROM activity_logs ORDER BY timestamp DESC")
+
+    buffer = get_buffer()
+    if buffer is None:
+        return [dict(row) for row in read()]
+    rows, pending = buffer.read_with_pending(read)
+    # Buffered entries that haven't been flushed yet are the newest
+    unflushed = [entry_row(entry) for entry in reversed(pending)]
+    return unflushed + [dict(row) for row in rows]
+
+def delete_activity_log(log_id, conn=None):
+    _execute("DELETE FROM activity_logs WHERE id = ?", (log_id,), conn)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,108 @@
+# deadlines.py
+"""Per-endpoint query deadlines.
+
+QUERY_DEADLINES maps an endpoint to the seconds its queries may run,
+counted from the start of the request. For those endpoints the request
+connection gets a SQLite progress handler that checks the clock every
+PROGRESS_STEPS virtual-machine instructions and, once the deadline has
+passed, makes SQLite abandon the running statement, which raises
+sqlite3.OperationalError("interrupted") in the view. Views catch it with
+exceeded() and answer with a "narrow your filter" message; every abort
+is counted per endpoint on Monitor System and in
+crm_db_query_aborts_total.
+
+The handler is removed when the view returns, except for a body streamed
+with pool.stream_with_connection(): it stays until the stream has been
+sent, so a long export is bounded as a whole, and the view's generator
+ends the stream with a truncation marker when the deadline passes.
+"""
+import sqlite3
+import time
+
+from flask import current_app, g, request
+
+from prometheus import count_query_abort
+
+PROGRESS_STEPS = 1000   # SQLite VM instructions between clock checks
+
+QUERY_DEADLINES = {
+    "dashboard.generate_report": 5.0,
+    "dashboard.download_report": 15.0,
+}
+
+
+class Deadline:
+    """A point in time after which statements on the attached connection abort."""
+
+    __slots__ = ("seconds", "at", "expired", "conn")
+
+    def __init__(self, seconds, start=None):
+        self.seconds = seconds
+        self.at = (time.perf_counter() if start is None else start) + seconds
+        self.expired = False
+        self.conn = None
+
+    def _check(self):
+        # Non-zero makes SQLite interrupt the statement
+        if time.perf_counter() >= self.at:
+            self.expired = True
+            return 1
+        return 0
+
+    def attach(self, conn, steps=PROGRESS_STEPS):
+        conn.set_progress_handler(self._check, steps)
+        conn.deadline = self
+        self.conn = conn
+
+    def detach(self):
+        conn, self.conn = self.conn, None
+        if conn is not None and conn.deadline is self:
+            conn.set_progress_handler(None, 0)
+            conn.deadline = None
+
+
+def exceeded(exc):
+    """Whether `exc` is this request's deadline interrupting a statement."""
+    deadline = g.get("query_deadline")
+    return isinstance(exc, sqlite3.OperationalError) and deadline is not None and deadline.expired
+
+
+# -------------------
+# FLASK INTEGRATION
+# -------------------
+def init_app(app):
+    """Give the endpoints in QUERY_DEADLINES (app config, else the
+    defaults above) a deadline on their request connection."""
+    deadlines = app.config.get("QUERY_DEADLINES", QUERY_DEADLINES)
+
+    @app.before_request
+    def start_deadline():
+        seconds = deadlines.get(request.endpoint)
+        if seconds is None:
+            return
+        g.query_deadline = Deadline(seconds, g.request_start)
+        conn = g.get("db_conn")
+        if conn is not None:
+            g.query_deadline.attach(conn)
+
+    @app.after_request
+    def stop_deadline(response):
+        # A streamed body still runs queries; teardown detaches it once sent
+        deadline = g.get("query_deadline")
+        if deadline is not None and not g.get("streaming"):
+            deadline.detach()
+        return response
+
+    @app.teardown_request
+    def count_abort(exc=None):
+        if g.get("streaming"):
+            return  # runs again when the stream ends (see pool.stream_with_connection)
+        deadline = g.pop("query_deadline", None)
+        if deadline is None:
+            return
+        deadline.detach()
+        if deadline.expired:
+            registry = current_app.extensions.get("metrics")
+            if registry is not None:
+                registry.count_abort(request.endpoint)
+            count_query_abort(request.endpoint)
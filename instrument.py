@@ -0,0 +1,207 @@
+# instrument.py
+"""Per-request SQL instrumentation.
+
+Pooled connections hand out InstrumentedCursor, which times each
+execute()/executemany() and the fetches that follow it, and counts the
+rows fetched; rows read by iterating the cursor instead are not timed
+or counted. While a request holds the connection the numbers go to
+that request's QueryLog, aggregated per normalized statement, so the
+cost per query is two perf_counter() calls and a dict update. Outside
+requests (CLI commands, the activity-log writer) nothing is recorded.
+
+After each request the summary is added as X-DB-Queries, X-DB-Time and
+Server-Timing headers and logged as one JSON line on the "crm.sql"
+logger, and a statement run more than SQL_REPEAT_WARN times gets an
+N+1 warning. Queries run while a streamed response is sent are not
+included.
+"""
+import json
+import logging
+import re
+import time
+from functools import lru_cache
+from sqlite3 import Cursor
+
+from flask import g, request
+
+logger = logging.getLogger("crm.sql")
+
+REPEAT_WARN = 10  # same statement this many times in one request looks like N+1
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def normalize(sql):
+    """`sql` with literals replaced by ? and whitespace collapsed, so the
+    same statement with different values or IN-list lengths matches."""
+    sql = _NUMBERS.sub("?", _STRINGS.sub("?", sql))
+    return _IN_LISTS.sub("(?)", _SPACE.sub(" ", sql)).strip()
+
+
+class QueryLog:
+    """Query counts and timings for one request.
+
+    A statement whose execute and fetches add up to `slow_seconds` is
+    passed once to on_slow(conn, sql, parameters, seconds).
+    """
+
+    __slots__ = ("statements", "count", "seconds", "rows", "slow_seconds", "on_slow")
+
+    def __init__(self, slow_seconds=float("inf"), on_slow=None):
+        self.statements = {}  # normalized sql -> [runs, seconds, rows]
+        self.count = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.slow_seconds = slow_seconds
+        self.on_slow = on_slow
+
+    def record(self, sql, seconds):
+        """Count one run of `sql`; returns its stats for later fetches."""
+        stats = self.statements.get(sql)
+        if stats is None:
+            stats = self.statements[sql] = [0, 0.0, 0]
+        stats[0] += 1
+        stats[1] += seconds
+        self.count += 1
+        self.seconds += seconds
+        return stats
+
+    def fetched(self, stats, seconds, rows):
+        stats[1] += seconds
+        stats[2] += rows
+        self.seconds += seconds
+        self.rows += rows
+
+    def merge(self, other):
+        """Add the counts of `other`, a log filled on another thread."""
+        for sql, (runs, seconds, rows) in other.statements.items():
+            stats = self.statements.get(sql)
+            if stats is None:
+                stats = self.statements[sql] = [0, 0.0, 0]
+            stats[0] += runs
+            stats[1] += seconds
+            stats[2] += rows
+        self.count += other.count
+        self.seconds += other.seconds
+        self.rows += other.rows
+
+    def repeated(self, limit):
+        """(sql, runs) for statements run more than `limit` times."""
+        return [(sql, stats[0]) for sql, stats in self.statements.items() if stats[0] > limit]
+
+
+class InstrumentedCursor(Cursor):
+    """Cursor that reports to its connection's query_log, if any."""
+
+    __slots__ = ("_log", "_stats", "_sql", "_parameters", "_elapsed")
+
+    def execute(self, sql, parameters=()):
+        log = self._log = self.connection.query_log
+        if log is None:
+            return Cursor.execute(self, sql, parameters)
+        start = time.perf_counter()
+        try:
+            return Cursor.execute(self, sql, parameters)
+        finally:
+            self._started(log, sql, parameters, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        log = self._log = self.connection.query_log
+        if log is None:
+            return Cursor.executemany(self, sql, seq_of_parameters)
+        start = time.perf_counter()
+        try:
+            return Cursor.executemany(self, sql, seq_of_parameters)
+        finally:
+            self._started(log, sql, None, time.perf_counter() - start)
+
+    def _started(self, log, sql, parameters, seconds):
+        self._stats = log.record(normalize(sql), seconds)
+        self._sql, self._parameters, self._elapsed = sql, parameters, 0.0
+        self._add_time(log, seconds)
+
+    def _add_time(self, log, seconds):
+        # Report a slow statement once, when its running total crosses the threshold
+        before = self._elapsed
+        self._elapsed = before + seconds
+        if before < log.slow_seconds <= self._elapsed and log.on_slow is not None:
+            log.on_slow(self.connection, self._sql, self._parameters, self._elapsed)
+
+    # Rows are stepped on fetch, so fetch time counts toward the statement
+    def fetchone(self):
+        log = getattr(self, "_log", None)
+        if log is None:
+            return Cursor.fetchone(self)
+        start = time.perf_counter()
+        row = Cursor.fetchone(self)
+        self._fetched(log, time.perf_counter() - start, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        log = getattr(self, "_log", None)
+        if log is None:
+            return Cursor.fetchmany(self, self.arraysize if size is None else size)
+        start = time.perf_counter()
+        rows = Cursor.fetchmany(self, self.arraysize if size is None else size)
+        self._fetched(log, time.perf_counter() - start, len(rows))
+        return rows
+
+    def fetchall(self):
+        log = getattr(self, "_log", None)
+        if log is None:
+            return Cursor.fetchall(self)
+        start = time.perf_counter()
+        rows = Cursor.fetchall(self)
+        self._fetched(log, time.perf_counter() - start, len(rows))
+        return rows
+
+    def _fetched(self, log, seconds, rows):
+        log.fetched(self._stats, seconds, rows)
+        self._add_time(log, seconds)
+
+
+# -------------------
+# FLASK INTEGRATION
+# -------------------
+def init_app(app):
+    """Instrument request queries unless SQL_INSTRUMENT is False."""
+    if not app.config.get("SQL_INSTRUMENT", True):
+        return
+    repeat_warn = app.config.get("SQL_REPEAT_WARN", REPEAT_WARN)
+    slow_log = app.extensions.get("slow_queries")
+
+    @app.before_request
+    def start_query_log():
+        if slow_log is not None:
+            g.query_log = QueryLog(slow_log.threshold, slow_log.report)
+        else:
+            g.query_log = QueryLog()
+
+    @app.after_request
+    def report_queries(response):
+        log = g.get("query_log")
+        if log is None:
+            return response
+        # request_start is set by pool.mark_request_start()
+        db_ms = log.seconds * 1000
+        response.headers["X-DB-Queries"] = str(log.count)
+        response.headers["X-DB-Time"] = f"{db_ms:.2f}"
+        response.headers.add("Server-Timing", f'db;dur={db_ms:.2f};desc="{log.count} queries"')
+
+        logger.info(json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "endpoint": request.endpoint,
+            "status": response.status_code,
+            "queries": log.count,
+            "rows": log.rows,
+            "db_ms": round(db_ms, 2),
+            "total_ms": round((time.perf_counter() - g.request_start) * 1000, 2),
+        }))
+        for sql, runs in log.repeated(repeat_warn):
+            logger.warning("possible N+1 in %s: %d runs of %s", request.endpoint, runs, sql)
+        return response
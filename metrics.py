@@ -0,0 +1,247 @@
+# metrics.py
+"""In-process request metrics for the monitoring console.
+
+The Registry keeps, per endpoint, request and error counts, a request
+rate over the last minute, a latency histogram and time spent in SQL
+(from instrument.QueryLog), plus the slowest statement of each recent
+request. It is updated after every request and read by
+dashboard.monitor_system and its JSON twin. Numbers are per process.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from flask import g, request
+
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+RATE_WINDOW = 60        # seconds the request rate is averaged over
+RECENT_QUERIES = 500    # requests whose slowest statement is kept
+SLOWEST_SHOWN = 10
+
+# table -> (cheap row-count source, SQL); "≈" sources are upper bounds
+TABLE_ROWS = {
+    "staff": ("stats", "SELECT total_staff FROM stats WHERE id = 1"),
+    "customers": ("stats", "SELECT total_customers FROM stats WHERE id = 1"),
+    "leads": ("stats", "SELECT total_leads FROM stats WHERE id = 1"),
+    "feedback": ("stats", "SELECT feedback_pending + feedback_resolved + feedback_other FROM stats WHERE id = 1"),
+    "transactions": ("rollup", "SELECT COALESCE(SUM(count), 0) FROM transactions_daily"),
+    "admins": ("≈ max id", "SELECT COALESCE(MAX(id), 0) FROM admins"),
+    "reminders": ("≈ max id", "SELECT COALESCE(MAX(id), 0) FROM reminders"),
+    "activity_logs": ("≈ max id", "SELECT COALESCE(MAX(id), 0) FROM activity_logs"),
+}
+
+
+class Histogram:
+    """Counts per latency bucket (ms), plus an overflow bucket."""
+
+    __slots__ = ("counts",)
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def observe(self, ms):
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if ms <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def percentile(self, p):
+        """Upper bound (ms) of the bucket holding the p-th percentile; None
+        when it falls past the last bucket."""
+        total = sum(self.counts)
+        if not total:
+            return 0
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.counts):
+            seen += count
+            if seen * 100 >= total * p:
+                return bound
+        return None
+
+
+class RateWindow:
+    """Events per second over the last RATE_WINDOW seconds."""
+
+    __slots__ = ("seconds", "counts")
+
+    def __init__(self):
+        self.seconds = [0] * RATE_WINDOW
+        self.counts = [0] * RATE_WINDOW
+
+    def add(self, now):
+        second = int(now)
+        slot = second % RATE_WINDOW
+        if self.seconds[slot] != second:
+            self.seconds[slot] = second
+            self.counts[slot] = 0
+        self.counts[slot] += 1
+
+    def rate(self, now, uptime):
+        second = int(now)
+        recent = sum(c for s, c in zip(self.seconds, self.counts) if second - s < RATE_WINDOW)
+        return recent / max(1.0, min(RATE_WINDOW, uptime))
+
+
+class EndpointMetrics:
+    __slots__ = ("requests", "errors", "aborts", "seconds", "max_seconds", "db_seconds", "queries",
+                 "histogram", "window")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.aborts = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.db_seconds = 0.0
+        self.queries = 0
+        self.histogram = Histogram()
+        self.window = RateWindow()
+
+
+class Registry:
+    """Thread-safe request metrics for one process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.endpoints = {}
+        self.window = RateWindow()
+        self.recent_queries = deque(maxlen=RECENT_QUERIES)
+
+    def _endpoint(self, endpoint):
+        metrics = self.endpoints.get(endpoint)
+        if metrics is None:
+            metrics = self.endpoints[endpoint] = EndpointMetrics()
+        return metrics
+
+    def observe_request(self, endpoint, status, seconds, query_log=None):
+        now = time.time()
+        slowest = None
+        if query_log is not None and query_log.statements:
+            sql, stats = max(query_log.statements.items(), key=lambda item: item[1][1])
+            slowest = (now, endpoint, sql, stats[0], stats[1] * 1000)
+        with self._lock:
+            metrics = self._endpoint(endpoint)
+            metrics.requests += 1
+            if status >= 500:
+                metrics.errors += 1
+            metrics.seconds += seconds
+            metrics.max_seconds = max(metrics.max_seconds, seconds)
+            metrics.histogram.observe(seconds * 1000)
+            metrics.window.add(now)
+            self.window.add(now)
+            if query_log is not None:
+                metrics.db_seconds += query_log.seconds
+                metrics.queries += query_log.count
+            if slowest is not None:
+                self.recent_queries.append(slowest)
+
+    def count_abort(self, endpoint):
+        """Count a request whose query deadline (deadlines.py) interrupted a statement."""
+        with self._lock:
+            self._endpoint(endpoint).aborts += 1
+
+    def snapshot(self):
+        """Plain-data copy of the request metrics."""
+        now = time.time()
+        uptime = now - self.started
+        with self._lock:
+            endpoints = {}
+            for name, m in sorted(self.endpoints.items()):
+                if not m.requests:
+                    continue
+                endpoints[name] = {
+                    "requests": m.requests,
+                    "errors": m.errors,
+                    "aborts": m.aborts,
+                    "rate_per_s": round(m.window.rate(now, uptime), 3),
+                    "avg_ms": round(m.seconds / m.requests * 1000, 2),
+                    "p50_ms": m.histogram.percentile(50),
+                    "p95_ms": m.histogram.percentile(95),
+                    "max_ms": round(m.max_seconds * 1000, 2),
+                    "queries_per_request": round(m.queries / m.requests, 1),
+                    "db_share": round(m.db_seconds / m.seconds, 3) if m.seconds else 0.0,
+                    "histogram": list(m.histogram.counts),
+                }
+            total_seconds = sum(m.seconds for m in self.endpoints.values())
+            db_seconds = sum(m.db_seconds for m in self.endpoints.values())
+            slowest = sorted(self.recent_queries, key=lambda q: q[4], reverse=True)[:SLOWEST_SHOWN]
+            return {
+                "uptime_s": round(uptime),
+                "requests": sum(m.requests for m in self.endpoints.values()),
+                "rate_per_s": round(self.window.rate(now, uptime), 3),
+                "db_share": round(db_seconds / total_seconds, 3) if total_seconds else 0.0,
+                # each histogram has one more count, for slower requests
+                "buckets_ms": list(LATENCY_BUCKETS_MS),
+                "endpoints": endpoints,
+                "slowest_queries": [
+                    {"at": round(at), "endpoint": endpoint, "sql": sql, "runs": runs, "ms": round(ms, 2)}
+                    for at, endpoint, sql, runs, ms in slowest
+                ],
+            }
+
+
+# -------------------
+# DATABASE STATE
+# -------------------
+def database_files(conn, path, connections):
+    """Sizes of the database, WAL and shared-memory files, page counts and
+    the page cache configured across `connections` open connections."""
+    def size(name):
+        try:
+            return os.path.getsize(name)
+        except OSError:
+            return 0
+
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    cache_size = conn.execute("PRAGMA cache_size").fetchone()[0]
+    # Negative cache_size is in KiB, positive in pages
+    cache_bytes = -cache_size * 1024 if cache_size < 0 else cache_size * page_size
+    return {
+        "path": path,
+        "db_bytes": size(path),
+        "wal_bytes": size(path + "-wal"),
+        "shm_bytes": size(path + "-shm"),
+        "page_size": page_size,
+        "page_count": conn.execute("PRAGMA page_count").fetchone()[0],
+        "freelist_count": conn.execute("PRAGMA freelist_count").fetchone()[0],
+        "page_cache_bytes": cache_bytes,
+        "page_cache_total_bytes": cache_bytes * connections,
+    }
+
+
+def table_rows(conn):
+    """{table: (rows, source)} from counters, rollups and max ids, never
+    from a COUNT(*) scan."""
+    rows = {}
+    for table, (source, sql) in TABLE_ROWS.items():
+        try:
+            row = conn.execute(sql).fetchone()
+        except sqlite3.OperationalError:
+            continue  # table not in this database
+        rows[table] = (row[0] if row else 0, source)
+    return rows
+
+
+# -------------------
+# FLASK INTEGRATION
+# -------------------
+def init_app(app):
+    """Record every request in app.extensions["metrics"]."""
+    registry = app.extensions["metrics"] = Registry()
+
+    # Timed from pool.mark_request_start()
+    @app.after_request
+    def observe_request(response):
+        start = g.get("request_start")
+        if start is not None:
+            registry.observe_request(
+                request.endpoint or "<unmatched>",
+                response.status_code,
+                time.perf_counter() - start,
+                g.get("query_log"),
+            )
+        return response
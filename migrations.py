@@ -0,0 +1,237 @@
+# migrations.py
+"""Versioned schema migrations keyed on ``PRAGMA user_version``.
+
+Each step is a function taking a connection. Steps run in order inside
+one write transaction each, and the database's user_version records the
+last one applied, so adding a migration means appending to MIGRATIONS.
+"""
+import re
+
+from principals import install_principals
+from rollups import install_rollups
+from search import install_search
+from typeahead import install_typeahead_indexes
+from stats import install_stats
+from timestamps import install_epoch_columns
+from versions import drop_version_triggers, install_versions
+
+
+def table_columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def add_column(conn, table, column, decl):
+    """ALTER TABLE ... ADD COLUMN, skipped when the column already exists."""
+    if column not in table_columns(conn, table):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+# -------------------
+# MIGRATION STEPS
+# -------------------
+def _customer_login_columns(conn):
+    # Login and user management read these on customers; older databases
+    # built by init_db() don't have them.
+    add_column(conn, "customers", "username", "TEXT")
+    add_column(conn, "customers", "password", "TEXT")
+    add_column(conn, "customers", "role", "TEXT")
+
+
+def _hot_path_indexes(conn):
+    # feedbacks(): WHERE customer_id=? ORDER BY created_at DESC
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_feedback_customer_created
+        ON feedback (customer_id, created_at)
+    """)
+    # transactions(): WHERE customer_id=? ORDER BY created_at DESC
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transactions_customer_created
+        ON transactions (customer_id, created_at)
+    """)
+    # schedule_reminder(): ORDER BY reminder_date
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_reminders_date
+        ON reminders (reminder_date)
+    """)
+    # get_activity_logs() / recent activity: ORDER BY timestamp DESC
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_activity_logs_timestamp
+        ON activity_logs (timestamp)
+    """)
+    # auth.login(): customers WHERE username=? (admins and staff already
+    # have UNIQUE autoindexes on username)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_customers_username
+        ON customers (username)
+    """)
+
+
+def _customer_reminder_index(conn):
+    # Customer dashboard: reminders WHERE customer_id=? AND reminder_date >= ?
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_reminders_customer_date
+        ON reminders (customer_id, reminder_date)
+    """)
+
+
+def _dashboard_stats(conn):
+    # Trigger-maintained counters for the admin dashboard (see stats.py)
+    install_stats(conn)
+
+
+def _login_principals(conn):
+    # Unified username -> credential index for login (see principals.py)
+    install_principals(conn)
+
+
+def _customer_search(conn):
+    # FTS5 index over customer contact details (see search.py)
+    install_search(conn)
+
+
+def _typeahead_indexes(conn):
+    # NOCASE prefix lookups on name, email and phone (see typeahead.py)
+    install_typeahead_indexes(conn)
+
+
+def _epoch_timestamps(conn):
+    # Indexed integer timestamps for date-range reports (see timestamps.py);
+    # existing rows are backfilled in batches by init_db()
+    install_epoch_columns(conn)
+
+
+def _transaction_rollups(conn):
+    # Trigger-maintained daily transaction totals (see rollups.py)
+    install_rollups(conn)
+
+
+# Tables with data_versions triggers as of _data_versions and
+# _data_version_times; the latest triggers come from versions.py
+_VERSIONED_TABLES = ("admins", "staff", "customers", "leads", "feedback", "reminders", "transactions")
+_VERSION_EVENTS = ("INSERT", "UPDATE", "DELETE")
+
+
+def _data_versions(conn):
+    # Per-table write counters for cache invalidation (see versions.py)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS data_versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    """)
+    for table in _VERSIONED_TABLES:
+        conn.execute("INSERT OR IGNORE INTO data_versions (name, version) VALUES (?, 0)", (table,))
+        for event in _VERSION_EVENTS:
+            conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_versions_{table}_{event.lower()} AFTER {event} ON {table}
+            BEGIN
+                UPDATE data_versions SET version = version + 1 WHERE name = '{table}';
+            END
+            """)
+
+
+def _data_version_times(conn):
+    # Record when each table was last written, for Last-Modified headers
+    add_column(conn, "data_versions", "updated_epoch", "INTEGER NOT NULL DEFAULT 0")
+    conn.execute("UPDATE data_versions SET updated_epoch = CAST(strftime('%s', 'now') AS INTEGER)")
+    for table in _VERSIONED_TABLES:
+        for event in _VERSION_EVENTS:
+            conn.execute(f"DROP TRIGGER IF EXISTS trg_versions_{table}_{event.lower()}")
+            conn.execute(f"""
+            CREATE TRIGGER trg_versions_{table}_{event.lower()} AFTER {event} ON {table}
+            BEGIN
+                UPDATE data_versions
+                SET version = version + 1, updated_epoch = CAST(strftime('%s', 'now') AS INTEGER)
+                WHERE name = '{table}';
+            END
+            """)
+
+
+def _data_version_batches(conn):
+    # Let bulk writes bump a table's version once (see versions.one_bump)
+    add_column(conn, "data_versions", "deferred", "INTEGER NOT NULL DEFAULT 0")
+    drop_version_triggers(conn)
+    install_versions(conn)
+
+
+MIGRATIONS = [
+    _customer_login_columns,
+    _hot_path_indexes,
+    _dashboard_stats,
+    _login_principals,
+    _customer_search,
+    _typeahead_indexes,
+    _epoch_timestamps,
+    _transaction_rollups,
+    _data_versions,
+    _data_version_times,
+    _customer_reminder_index,
+    _data_version_batches,
+]
+
+
+# -------------------
+# RUNNER
+# -------------------
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Apply pending migrations; returns the number of steps applied."""
+    applied = 0
+    while True:
+        # BEGIN IMMEDIATE takes the write lock before re-reading the
+        # version, so concurrently starting workers apply each step once.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = schema_version(conn)
+            if version >= len(MIGRATIONS):
+                conn.rollback()
+                return applied
+            MIGRATIONS[version](conn)
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied += 1
+
+
+# -------------------
+# QUERY PLAN CHECK
+# -------------------
+# Hot-path queries the indexes above exist for, with sample parameters.
+HOT_PATH_QUERIES = [
+    ("SELECT message, status, handled_by, created_at FROM feedback "
+     "WHERE customer_id=? ORDER BY created_at DESC", (1,)),
+    ("SELECT amount, status, type, created_at FROM transactions "
+     "WHERE customer_id=? ORDER BY created_at DESC", (1,)),
+    ("SELECT r.id, r.title, r.reminder_date, r.status FROM reminders r "
+     "LEFT JOIN customers c ON r.customer_id = c.id ORDER BY r.reminder_date ASC", ()),
+    ("SELECT * FROM activity_logs ORDER BY timestamp DESC", ()),
+    ("SELECT title, reminder_date FROM reminders WHERE customer_id = ? "
+     "AND reminder_date >= date('now') AND status = 'pending' ORDER BY reminder_date", (1,)),
+    ("SELECT role, source_id, username FROM principals WHERE username = ? "
+     "AND (password = ? OR (rank = 2 AND password = ?)) ORDER BY rank, source_id LIMIT 1",
+     ("", "", "")),
+    ("SELECT * FROM customers WHERE username=? AND password=?", ("", "")),
+    ("SELECT id, customer_id, amount, type, status, created_at FROM transactions "
+     "WHERE created_epoch >= ? AND created_epoch < ?", (0, 0)),
+    ("SELECT * FROM customers "
+     "WHERE created_epoch >= ? AND created_epoch < ?", (0, 0)),
+]
+
+# "SCAN <table>" without "USING ... INDEX" is a full table scan (before
+# SQLite 3.36, "SCAN TABLE <table>")
+_FULL_SCAN = re.compile(r"SCAN (TABLE )?\w+( AS \w+)?")
+
+
+def query_plan_problems(conn, queries=HOT_PATH_QUERIES):
+    """Return (query, plan) pairs whose plan has a full scan or a temp sort."""
+    problems = []
+    for query, params in queries:
+        plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params)]
+        if any(_FULL_SCAN.fullmatch(step) or "TEMP B-TREE" in step for step in plan):
+            problems.append((query, plan))
+    return problems
@@ -0,0 +1,177 @@
+# pagination.py
+"""Keyset (cursor) pagination for list views.
+
+Pages are fetched with ``WHERE (key) > (last key seen) ORDER BY key
+LIMIT n`` instead of OFFSET, so every page costs one index range scan no
+matter how deep it is. Cursors are the ordering key of the boundary row,
+encoded into an opaque URL-safe token.
+"""
+import base64
+import binascii
+import json
+
+from flask import current_app, request, url_for
+
+PAGE_SIZE = 25
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(key):
+    raw = json.dumps(list(key), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Decode a cursor token; returns None for a missing or mangled one."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        key = json.loads(raw)
+    except (binascii.Error, ValueError):
+        return None
+    if not isinstance(key, list) or not all(isinstance(v, (int, float, str)) for v in key):
+        return None
+    return key
+
+
+def page_args():
+    """(after, before, size) from the query string."""
+    default = current_app.config.get("PAGE_SIZE", PAGE_SIZE)
+    size = request.args.get("per_page", default, type=int)
+    size = max(1, min(size, MAX_PAGE_SIZE))
+    return decode_cursor(request.args.get("after")), decode_cursor(request.args.get("before")), size
+
+
+def page_url(**changes):
+    """URL of the current view with its query string updated by `changes`
+    (None removes a key), so page links keep filters such as ?q=."""
+    args = request.args.to_dict()
+    args.pop("after", None)
+    args.pop("before", None)
+    for key, value in changes.items():
+        if value is None:
+            args.pop(key, None)
+        else:
+            args[key] = value
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+
+class Page:
+    """One page of rows plus the cursors for its neighbours."""
+
+    def __init__(self, rows, size, next_cursor=None, prev_cursor=None):
+        self.rows = rows
+        self.size = size
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def _key_names(order_by):
+    # "r.reminder_date" is read back from the row as "reminder_date"
+    return [column.split(".")[-1] for column in order_by]
+
+
+def _fetch(conn, select, order_by, where, params, bound, op, descending, limit):
+    clauses = [where] if where else []
+    params = list(params)
+    if bound is not None:
+        placeholders = ", ".join("?" * len(order_by))
+        clauses.append(f"({', '.join(order_by)}) {op} ({placeholders})")
+        params.extend(bound)
+    direction = " DESC" if descending else ""
+    sql = select
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY " + ", ".join(column + direction for column in order_by)
+    sql += " LIMIT ?"
+    params.append(limit)
+    return conn.execute(sql, params).fetchall()
+
+
+def keyset_page(conn, select, order_by, where="", params=(), after=None, before=None, size=PAGE_SIZE):
+    """Fetch one page of ``select`` ordered by the unique key ``order_by``.
+
+    ``order_by`` must identify a row uniquely (end it with the primary
+    key) and should match an index. Pass ``after`` to page forward from a
+    next_cursor, ``before`` to page back from a prev_cursor.
+    """
+    names = _key_names(order_by)
+
+    def key(row):
+        return [row[name] for name in names]
+
+    if before is not None and len(before) == len(order_by):
+        rows = _fetch(conn, select, order_by, where, params, before, "<", True, size + 1)
+        has_prev = len(rows) > size
+        rows = rows[:size][::-1]
+        has_next = True
+    else:
+        bound = after if after is not None and len(after) == len(order_by) else None
+        rows = _fetch(conn, select, order_by, where, params, bound, ">", False, size + 1)
+        has_next = len(rows) > size
+        rows = rows[:size]
+        has_prev = bound is not None
+
+    return Page(
+        rows,
+        size,
+        next_cursor=encode_cursor(key(rows[-1])) if rows and has_next else None,
+        prev_cursor=encode_cursor(key(rows[0])) if rows and has_prev else None,
+    )
+
+
+def chained_page(conn, sources, after=None, before=None, size=PAGE_SIZE):
+    """Keyset page over several tables read one after another.
+
+    ``sources`` is a list of ``(tag, select)`` pairs, each paged by ``id``;
+    the cursor is ``[source index, id]``. Reading the tables in turn keeps
+    every step a primary-key range scan, where a UNION ALL ordered by
+    (source, id) would scan and sort all of them. Rows are returned as
+    ``(tag, row)`` pairs.
+    """
+    def valid(key):
+        return key is not None and len(key) == 2 and isinstance(key[0], int)
+
+    if valid(before):
+        index, bound, step = before[0], [before[1]], -1
+    elif valid(after):
+        index, bound, step = after[0], [after[1]], 1
+    else:
+        index, bound, step = 0, None, 1
+
+    collected = []
+    more = False
+    while 0 <= index < len(sources):
+        tag, select = sources[index]
+        want = size + 1 - len(collected)
+        rows = _fetch(conn, select, ["id"], "", (), bound, ">" if step > 0 else "<", step < 0, want)
+        collected.extend((index, tag, row) for row in rows)
+        if len(collected) > size:
+            more = True
+            break
+        index += step
+        bound = None
+
+    collected = collected[:size]
+    if step < 0:
+        collected.reverse()
+        has_prev, has_next = more, True
+    else:
+        has_prev, has_next = valid(after), more
+
+    def cursor(entry):
+        return encode_cursor([entry[0], entry[2]["id"]])
+
+    return Page(
+        [(tag, row) for _, tag, row in collected],
+        size,
+        next_cursor=cursor(collected[-1]) if collected and has_next else None,
+        prev_cursor=cursor(collected[0]) if collected and has_prev else None,
+    )
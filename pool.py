@@ -0,0 +1,339 @@
+# pool.py
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from flask import current_app, g, has_app_context, has_request_context, request, stream_with_context
+
+from instrument import InstrumentedCursor
+
+DB_NAME = "crm_app.db"
+
+POOL_SIZE = 8          # read-only connections
+WRITER_POOL_SIZE = 1   # the dedicated writer; requests that write queue for it
+POOL_TIMEOUT = 5.0     # seconds a request waits for a free connection
+# Prepared statements kept per connection; report SQL is reused verbatim
+# across requests (see reports.py), so keep more than the default 128.
+CACHED_STATEMENTS = 256
+
+# Applied once when a connection is opened, not on every checkout.
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("busy_timeout", 5000),
+    ("cache_size", -16000),     # ~16 MB page cache per connection
+    ("mmap_size", 134217728),   # 128 MB
+)
+
+# Readers open with mode=ro and can't change the journal mode; WAL is
+# already set by the writer, so they never block it or each other.
+READER_PRAGMAS = (
+    ("query_only", 1),
+    ("busy_timeout", 5000),
+    ("cache_size", -16000),
+    ("mmap_size", 134217728),
+)
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """Raised when no connection frees up within the checkout timeout."""
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection that goes back to its pool instead of closing."""
+
+    pool = None
+    pinned = False  # owned by the current request, released at teardown
+    tx_depth = 0    # open db.transaction() blocks
+    query_log = None  # instrument.QueryLog of the request holding it
+    deadline = None   # deadlines.Deadline whose progress handler is installed
+
+    # Connection.execute() builds its cursor in C without calling cursor(),
+    # so route both through InstrumentedCursor explicitly.
+    def cursor(self, factory=InstrumentedCursor):
+        return sqlite3.Connection.cursor(self, factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        if self.pinned:
+            return
+        if self.pool is not None:
+            self.pool.release(self)
+        else:
+            sqlite3.Connection.close(self)
+
+
+class ConnectionPool:
+    """Bounded pool of configured SQLite connections (read-only ones
+    with ``readonly``)."""
+
+    def __init__(self, database=DB_NAME, size=POOL_SIZE, timeout=POOL_TIMEOUT, readonly=False):
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self.readonly = readonly
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+
+    def _connect(self):
+        if self.readonly:
+            target, pragmas = Path(self.database).resolve().as_uri() + "?mode=ro", READER_PRAGMAS
+        else:
+            target, pragmas = self.database, PRAGMAS
+        conn = sqlite3.connect(
+            target,
+            uri=self.readonly,
+            factory=PooledConnection,
+            check_same_thread=False,
+            cached_statements=CACHED_STATEMENTS,
+        )
+        for name, value in pragmas:
+            conn.execute(f"PRAGMA {name}={value}")
+        conn.row_factory = sqlite3.Row
+        conn.pool = self
+        return conn
+
+    def acquire(self):
+        """Check a connection out, opening a new one while under `size`."""
+        start = time.perf_counter()
+        conn = None
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                grow = self._created < self.size
+                if grow:
+                    self._created += 1
+            if grow:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise PoolTimeout(
+                        f"no database connection available after {self.timeout}s"
+                    )
+
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            if waited > 0.001:
+                self._waits += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return conn
+
+    def release(self, conn):
+        """Return a connection, rolling back anything left uncommitted."""
+        conn.pinned = False
+        conn.tx_depth = 0
+        conn.query_log = None
+        if conn.deadline is not None:
+            conn.deadline.detach()
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put(conn)
+
+    def close_all(self):
+        """Close idle connections; checked-out ones are closed on release."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            sqlite3.Connection.close(conn)
+            with self._lock:
+                self._created -= 1
+
+    def stats(self):
+        """Pool size and checkout-wait metrics."""
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": self._created,
+                "in_use": self._in_use,
+                "idle": self._created - self._in_use,
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "wait_avg_ms": (self._wait_total / self._checkouts * 1000) if self._checkouts else 0.0,
+                "wait_max_ms": self._wait_max * 1000,
+            }
+
+
+# -------------------
+# FLASK INTEGRATION
+# -------------------
+_default_pool = None
+_default_lock = threading.Lock()
+_thread = threading.local()
+
+
+def init_app(app):
+    """Attach the writer and reader pools to the app and release request
+    connections on teardown. DB_READ_ROUTING = False sends everything
+    through the read-write pool, sized by DB_POOL_SIZE, as before."""
+    database = app.config.get("DATABASE", DB_NAME)
+    timeout = app.config.get("DB_POOL_TIMEOUT", POOL_TIMEOUT)
+    size = app.config.get("DB_POOL_SIZE", POOL_SIZE)
+    if app.config.get("DB_READ_ROUTING", True):
+        app.extensions["db_pool"] = ConnectionPool(
+            database, size=app.config.get("DB_WRITER_POOL_SIZE", WRITER_POOL_SIZE), timeout=timeout
+        )
+        app.extensions["db_readers"] = ConnectionPool(database, size=size, timeout=timeout, readonly=True)
+    else:
+        app.extensions["db_pool"] = ConnectionPool(database, size=size, timeout=timeout)
+    # Registered before any other extension's hook, so the request timings
+    # in instrument, metrics, deadlines and prometheus share one start
+    app.before_request(mark_request_start)
+    app.after_request(release_after_stream)
+    app.teardown_appcontext(release_request_connection)
+
+
+def get_pool(readonly=False):
+    """The app's writer pool (or reader pool) inside an app context,
+    otherwise a module-wide read-write one."""
+    global _default_pool
+    if has_app_context() and "db_pool" in current_app.extensions:
+        if readonly and current_app.extensions.get("db_readers") is not None:
+            return current_app.extensions["db_readers"]
+        return current_app.extensions["db_pool"]
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = ConnectionPool(DB_NAME)
+        return _default_pool
+
+
+# -------------------
+# READ/WRITE ROUTING
+# -------------------
+# A request gets a reader for GET/HEAD and the writer for anything else.
+# Views that don't follow that rule say so with @read_only or @writes
+# (below the route decorator).
+def read_only(view):
+    """Serve this view from a read-only connection whatever the method."""
+    view.db_access = "read"
+    return view
+
+
+def writes(view):
+    """Give this view the writer even for GET requests."""
+    view.db_access = "write"
+    return view
+
+
+def queued_writes(view):
+    """This view writes only through writer.run_write(), so it can read
+    from a reader even on POST (if the app has a write queue)."""
+    view.db_access = "queued"
+    return view
+
+
+def _request_reads_only():
+    if not has_request_context():
+        return False  # CLI commands, migrations, background work
+    view = current_app.view_functions.get(request.endpoint)
+    access = getattr(view, "db_access", None)
+    if access == "queued":
+        return current_app.extensions.get("write_queue") is not None
+    if access is not None:
+        return access == "read"
+    return request.method in ("GET", "HEAD", "OPTIONS")
+
+
+def get_request_connection():
+    """One pooled connection per app context (a reader or the writer, see
+    above); outside one, a plain checkout (or the connection pinned to
+    this thread by pin_to_thread())."""
+    if not has_app_context():
+        conn = getattr(_thread, "conn", None)
+        return conn if conn is not None else get_pool().acquire()
+    if "db_conn" not in g:
+        conn = get_pool(readonly=_request_reads_only()).acquire()
+        conn.pinned = True
+        conn.query_log = g.get("query_log")
+        if g.get("query_deadline") is not None:
+            g.query_deadline.attach(conn)
+        g.db_conn = conn
+    return g.db_conn
+
+
+def pin_to_thread(conn):
+    """Outside a request, make get_request_connection() return `conn` on
+    this thread until unpin_from_thread(); used by db.transaction()."""
+    conn.pinned = True
+    _thread.conn = conn
+
+
+def unpin_from_thread(conn):
+    conn.pinned = False
+    _thread.conn = None
+
+
+def mark_request_start():
+    g.request_start = time.perf_counter()
+
+
+def release_request_connection(exc=None):
+    if g.get("streaming"):
+        return  # the body still reads from it; see stream_with_connection()
+    conn = g.pop("db_conn", None)
+    if conn is not None:
+        conn.pool.release(conn)
+
+
+def stream_with_connection(generator):
+    """stream_with_context() that keeps the request connection, and any
+    query deadline on it, until the body has been sent.
+
+    Flask tears the request down once when the view returns, before the
+    body is iterated, and again when the stream ends; the first teardown
+    is skipped while g.streaming is set.
+    """
+    g.streaming = True
+
+    def body():
+        try:
+            yield from generator
+        finally:
+            g.streaming = False
+
+    return stream_with_context(body())
+
+
+def release_after_stream(response):
+    # A stream closed before it started never runs its second teardown
+    if g.get("streaming"):
+        state = g._get_current_object()
+
+        def release():
+            conn = state.pop("db_conn", None)
+            if conn is not None:
+                conn.pool.release(conn)
+
+        response.call_on_close(release)
+    return response
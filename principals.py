@@ -0,0 +1,114 @@
+# principals.py
+"""Unified credential index for login.
+
+``principals`` holds one row per admin, staff member and customer with a
+username: (username, rank, source_id) -> role, password. Triggers on the
+three user tables keep it in sync, so login is one lookup on the primary
+key instead of a query per table. ``rank`` preserves the old lookup
+order when the same username exists in several tables.
+"""
+from versions import one_bump
+
+# (rank, role, table)
+PRINCIPAL_SOURCES = [
+    (0, "admin", "admins"),
+    (1, "staff", "staff"),
+    (2, "customer", "customers"),
+]
+
+# SHA256 hex digests; anything else in a password column is plaintext
+_IS_HASHED = "(length(password) = 64 AND password NOT GLOB '*[^0-9a-f]*')"
+
+
+def install_principals(conn):
+    """Create the principals table and sync triggers, then fill it."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS principals (
+        username TEXT NOT NULL,
+        rank INTEGER NOT NULL,
+        source_id INTEGER NOT NULL,
+        role TEXT NOT NULL,
+        password TEXT,
+        PRIMARY KEY (username, rank, source_id)
+    ) WITHOUT ROWID
+    """)
+
+    for rank, role, table in PRINCIPAL_SOURCES:
+        insert = f"""
+            INSERT OR REPLACE INTO principals (username, rank, source_id, role, password)
+            SELECT NEW.username, {rank}, NEW.id, '{role}', NEW.password
+            WHERE NEW.username IS NOT NULL;
+        """
+        delete = f"""
+            DELETE FROM principals
+            WHERE username = OLD.username AND rank = {rank} AND source_id = OLD.id;
+        """
+        conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_principals_{table}_insert AFTER INSERT ON {table}
+        BEGIN {insert} END
+        """)
+        conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_principals_{table}_update
+        AFTER UPDATE OF username, password ON {table}
+        BEGIN {delete} {insert} END
+        """)
+        conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_principals_{table}_delete AFTER DELETE ON {table}
+        BEGIN {delete} END
+        """)
+
+    rebuild_principals(conn)
+
+
+def rebuild_principals(conn):
+    """Refill principals from the user tables."""
+    conn.execute("DELETE FROM principals")
+    for rank, role, table in PRINCIPAL_SOURCES:
+        conn.execute(f"""
+            INSERT OR REPLACE INTO principals (username, rank, source_id, role, password)
+            SELECT username, {rank}, id, '{role}', password
+            FROM {table} WHERE username IS NOT NULL
+        """)
+
+
+def find_principal(conn, username, hashed_password, password):
+    """Resolve a login to (role, user_id, username), or None.
+
+    Customers created before passwords were hashed may still hold a
+    plaintext password; those match read-only here and are converted
+    offline by hash_plaintext_passwords().
+    """
+    return conn.execute("""
+        SELECT role, source_id, username FROM principals
+        WHERE username = ?
+          AND (password = ? OR (rank = 2 AND password = ?))
+        ORDER BY rank, source_id
+        LIMIT 1
+    """, (username, hashed_password, password)).fetchone()
+
+
+def hash_plaintext_passwords(conn, hasher, batch_size=500):
+    """Hash plaintext customer passwords in committed batches.
+
+    Walks customers by id so each batch is a short write transaction;
+    the principals triggers pick up every change. Returns the number of
+    passwords converted.
+    """
+    converted = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(f"""
+            SELECT id, password FROM customers
+            WHERE id > ? AND password IS NOT NULL AND NOT {_IS_HASHED}
+            ORDER BY id LIMIT ?
+        """, (last_id, batch_size)).fetchall()
+        if not rows:
+            return converted
+        with one_bump(conn, "customers"):
+            conn.executemany(
+                "UPDATE customers SET password = ? WHERE id = ?",
+                [(hasher(password), customer_id) for customer_id, password in rows],
+            )
+        conn.commit()
+        converted += len(rows)
+        last_id = rows[-1][0]
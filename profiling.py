@@ -0,0 +1,158 @@
+# profiling.py
+"""Opt-in per-request profiles in collapsed-stack (flamegraph) format.
+
+A request is profiled when an admin sends an ``X-Profile: 1`` header or
+a ``_profile=1`` query parameter, or when it is picked by sampling one
+in PROFILE_SAMPLE_EVERY requests (0, the default, turns sampling off).
+The request thread then runs under sys.setprofile, and every call and
+return charges the time since the previous event to the current stack.
+The result is written as ``<endpoint>@<UTC timestamp>.folded`` in
+PROFILE_DIR (default ``<database>-profiles/``): one ``frame;frame;...
+microseconds`` line per stack, which flamegraph.pl, speedscope and
+inferno read directly. Only the newest PROFILE_KEEP files are kept.
+
+Profiling slows the request it covers several times over, so the
+stored durations are inflated; compare stacks, not absolute times.
+"""
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+from flask import g, request, session
+
+PROFILE_KEEP = 200
+SAMPLE_EVERY = 0
+SUFFIX = ".folded"
+
+
+def _code_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _builtin_label(func):
+    module = getattr(func, "__module__", None) or "builtins"
+    return f"{module}.{getattr(func, '__qualname__', repr(func))}"
+
+
+class StackProfiler:
+    """Exact time per call stack for the calling thread."""
+
+    def __init__(self):
+        self.totals = {}
+        self._keys = [""]   # collapsed key of each stack depth
+        self._last = 0.0
+
+    def _event(self, frame, event, arg):
+        now = time.perf_counter()
+        keys = self._keys
+        key = keys[-1]
+        if len(keys) > 1:
+            self.totals[key] = self.totals.get(key, 0.0) + (now - self._last)
+        if event == "call":
+            keys.append(f"{key};{_code_label(frame.f_code)}" if key else _code_label(frame.f_code))
+        elif event == "c_call":
+            keys.append(f"{key};{_builtin_label(arg)}" if key else _builtin_label(arg))
+        elif len(keys) > 1:  # return, c_return, c_exception
+            keys.pop()
+        self._last = time.perf_counter()
+
+    def start(self):
+        self._last = time.perf_counter()
+        sys.setprofile(self._event)
+
+    def stop(self):
+        sys.setprofile(None)
+
+    def folded(self):
+        """Collapsed-stack lines, weights in microseconds."""
+        return "".join(
+            f"{stack} {round(seconds * 1e6)}\n"
+            for stack, seconds in sorted(self.totals.items())
+            if round(seconds * 1e6) > 0
+        )
+
+
+class ProfileStore:
+    """Bounded directory of .folded profiles."""
+
+    def __init__(self, directory, keep=PROFILE_KEEP):
+        self.directory = directory
+        self.keep = keep
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def save(self, endpoint, folded):
+        """Write a profile; returns its file name."""
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S.%fZ")
+        name = f"{endpoint}@{stamp}{SUFFIX}"
+        with open(os.path.join(self.directory, name), "w") as f:
+            f.write(folded)
+        self._prune()
+        return name
+
+    def _prune(self):
+        with self._lock:
+            names = self._names()
+            for name in names[:-self.keep] if len(names) > self.keep else ():
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def _names(self):
+        # Oldest first, by the timestamp in the name
+        names = [name for name in os.listdir(self.directory) if name.endswith(SUFFIX) and "@" in name]
+        return sorted(names, key=lambda name: name.rsplit("@", 1)[1])
+
+    def listing(self, limit=50):
+        """Newest profiles as dicts of name, endpoint, taken_at and bytes."""
+        profiles = []
+        for name in reversed(self._names()[-limit:]):
+            endpoint, stamp = name[:-len(SUFFIX)].rsplit("@", 1)
+            try:
+                size = os.path.getsize(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            taken_at = datetime.strptime(stamp, "%Y%m%dT%H%M%S.%fZ").replace(tzinfo=timezone.utc)
+            profiles.append({"name": name, "endpoint": endpoint, "taken_at": taken_at.timestamp(), "bytes": size})
+        return profiles
+
+
+# -------------------
+# FLASK INTEGRATION
+# -------------------
+def _requested():
+    flag = request.headers.get("X-Profile") or request.args.get("_profile")
+    return flag not in (None, "", "0") and session.get("role") == "admin"
+
+
+def init_app(app):
+    """Profile requests on demand (admins) and one in PROFILE_SAMPLE_EVERY."""
+    directory = app.config.get("PROFILE_DIR") or app.config["DATABASE"] + "-profiles"
+    store = app.extensions["profiles"] = ProfileStore(directory, app.config.get("PROFILE_KEEP", PROFILE_KEEP))
+    sample_every = app.config.get("PROFILE_SAMPLE_EVERY", SAMPLE_EVERY)
+
+    @app.before_request
+    def start_profile():
+        if request.endpoint is None or request.endpoint == "static":
+            return
+        if _requested() or (sample_every and random.randrange(sample_every) == 0):
+            g.profiler = StackProfiler()
+            g.profiler.start()
+
+    @app.after_request
+    def save_profile(response):
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.stop()
+            response.headers["X-Profile-Id"] = store.save(request.endpoint, profiler.folded())
+        return response
+
+    @app.teardown_request
+    def stop_profile(exc=None):
+        # Errors propagated in debug/testing mode skip after_request
+        if g.pop("profiler", None) is not None:
+            sys.setprofile(None)
@@ -0,0 +1,368 @@
+# prometheus.py
+"""Prometheus text exposition at /metrics, correct across worker processes.
+
+Each process keeps its samples in its own memory-mapped file in
+METRICS_DIR (default: ``<database>-metrics/``), so recording a sample is
+a struct write with no locking between processes. /metrics, served by
+whichever worker gets the scrape, reads every file in the directory and
+merges them: counters and histograms are summed (files of exited workers
+included, so totals never go backwards) and last-seen times take the
+maximum. Last-seen times are per user, so they go into files of their
+own, one per process per SESSION_WINDOW period; only the current and
+previous periods are read, and older files are deleted, so those slots
+live no longer than the window that uses them. Clear the directory when
+the app is redeployed.
+
+Exposed:
+    crm_http_requests_total{endpoint, method, status}
+    crm_http_request_duration_seconds{endpoint}     histogram
+    crm_db_queries_total{endpoint}
+    crm_db_duration_seconds{endpoint}               histogram, SQL time per request
+    crm_db_query_aborts_total{endpoint}             statements stopped by a query deadline
+    crm_logins_total{result, role}
+    crm_active_sessions{role}                       users seen in the last SESSION_WINDOW
+"""
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import defaultdict
+
+from flask import Response, abort, current_app, g, request, session
+
+from metrics import LATENCY_BUCKETS_MS
+
+SESSION_WINDOW = 30 * 60  # seconds since a user's last request that still counts as active
+INITIAL_FILE_SIZE = 64 * 1024
+BUCKETS = tuple(ms / 1000 for ms in LATENCY_BUCKETS_MS)
+ROLES = ("admin", "staff", "customer")
+
+# name -> (type, help)
+METRICS = {
+    "crm_http_requests_total": ("counter", "Requests handled, by endpoint, method and status."),
+    "crm_http_request_duration_seconds": ("histogram", "Request latency by endpoint."),
+    "crm_db_queries_total": ("counter", "SQL statements run by requests, by endpoint."),
+    "crm_db_duration_seconds": ("histogram", "Time each request spent in SQL, by endpoint."),
+    "crm_db_query_aborts_total": ("counter", "Requests whose query deadline interrupted a statement, by endpoint."),
+    "crm_logins_total": ("counter", "Login attempts by result and role."),
+    "crm_active_sessions": ("gauge", f"Signed-in users with a request in the last {SESSION_WINDOW}s."),
+}
+
+
+# -------------------
+# SHARED FILES
+# -------------------
+_HEADER = struct.Struct("<q")   # bytes used
+_LENGTH = struct.Struct("<i")
+_VALUE = struct.Struct("<d")
+
+
+def _padded(n):
+    return n + (-n % 8)
+
+
+class MmapValues:
+    """Float values by string key in a file other processes can read.
+
+    Layout: an 8-byte count of bytes used, then entries of a 4-byte key
+    length, the UTF-8 key padded to 8-byte alignment and an 8-byte
+    double. Entries are only appended and values updated in place, and
+    the used count is written after the entry, so readers never see a
+    half-written key.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a+b")
+        size = os.fstat(self._file.fileno()).st_size
+        if size == 0:
+            self._file.truncate(INITIAL_FILE_SIZE)
+            size = INITIAL_FILE_SIZE
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self._used = _HEADER.unpack_from(self._map, 0)[0] or _HEADER.size
+        _HEADER.pack_into(self._map, 0, self._used)
+        self._positions = {key: pos for key, _, pos in _entries(self._map, self._used)}
+
+    def _position(self, key):
+        pos = self._positions.get(key)
+        if pos is not None:
+            return pos
+        encoded = key.encode()
+        entry = _padded(_LENGTH.size + len(encoded)) + _VALUE.size
+        if self._used + entry > len(self._map):
+            capacity = len(self._map)
+            while self._used + entry > capacity:
+                capacity *= 2
+            self._map.close()
+            self._file.truncate(capacity)
+            self._map = mmap.mmap(self._file.fileno(), capacity)
+        start = self._used
+        _LENGTH.pack_into(self._map, start, len(encoded))
+        self._map[start + _LENGTH.size:start + _LENGTH.size + len(encoded)] = encoded
+        pos = start + entry - _VALUE.size
+        _VALUE.pack_into(self._map, pos, 0.0)
+        self._used = start + entry
+        _HEADER.pack_into(self._map, 0, self._used)
+        self._positions[key] = pos
+        return pos
+
+    def add(self, key, amount):
+        with self._lock:
+            pos = self._position(key)
+            _VALUE.pack_into(self._map, pos, _VALUE.unpack_from(self._map, pos)[0] + amount)
+
+    def set(self, key, value):
+        with self._lock:
+            pos = self._position(key)  # may remap, so before reading self._map
+            _VALUE.pack_into(self._map, pos, value)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+def _entries(buffer, used):
+    """(key, value, value position) for each entry in a values file."""
+    pos = _HEADER.size
+    while pos < used:
+        length = _LENGTH.unpack_from(buffer, pos)[0]
+        key = bytes(buffer[pos + _LENGTH.size:pos + _LENGTH.size + length]).decode()
+        value_pos = pos + _padded(_LENGTH.size + length)
+        yield key, _VALUE.unpack_from(buffer, value_pos)[0], value_pos
+        pos = value_pos + _VALUE.size
+
+
+def read_values(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < _HEADER.size:
+        return []
+    used = min(_HEADER.unpack_from(data, 0)[0], len(data))
+    return [(key, value) for key, value, _ in _entries(data, used)]
+
+
+def _period(epoch):
+    return int(epoch // SESSION_WINDOW)
+
+
+def _key(name, **labels):
+    return json.dumps([name, sorted(labels.items())])
+
+
+class ProcessMetrics:
+    """This process's files in `directory`: one summed, plus one
+    max-merged file per SESSION_WINDOW period.
+
+    Files are reopened when the pid changes, so workers forked from a
+    preloaded app each get their own.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _files(self):
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    self.sums = MmapValues(os.path.join(self.directory, f"sum_{pid}.db"))
+                    self.maxes, self._period, self._previous = None, None, None
+                    self._pid = pid
+        return self
+
+    def _seen_file(self, period):
+        # The period's file, opened on first use. The one before is closed
+        # a period later, so a thread still writing to it isn't cut off.
+        if self._period != period:
+            with self._lock:
+                if self._period != period:
+                    if self._previous is not None:
+                        self._previous.close()
+                    self._previous = self.maxes
+                    self.maxes = MmapValues(os.path.join(self.directory, f"max_{self._pid}_{period}.db"))
+                    self._period = period
+        return self.maxes
+
+    def inc(self, name, amount=1, **labels):
+        self._files().sums.add(_key(name, **labels), amount)
+
+    def observe(self, name, seconds, **labels):
+        files = self._files()
+        for bound in BUCKETS:
+            if seconds <= bound:
+                files.sums.add(_key(name + "_bucket", le=str(bound), **labels), 1)
+        files.sums.add(_key(name + "_bucket", le="+Inf", **labels), 1)
+        files.sums.add(_key(name + "_sum", **labels), seconds)
+        files.sums.add(_key(name + "_count", **labels), 1)
+
+    def seen(self, name, value, **labels):
+        """Record a time (epoch seconds); merged across processes by max."""
+        self._files()._seen_file(_period(value)).set(_key(name, **labels), value)
+
+    def _recent_seen_files(self):
+        # Files of the current and previous periods; older ones (and the
+        # per-process max_<pid>.db of earlier versions) are removed
+        current = _period(time.time())
+        recent = []
+        for path in glob.glob(os.path.join(self.directory, "max_*.db")):
+            try:
+                period = int(os.path.basename(path)[:-3].rsplit("_", 1)[1])
+            except ValueError:
+                continue
+            if period >= current - 1:
+                recent.append(path)
+            else:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        return recent
+
+    def collect(self):
+        """Samples merged across every process's files, as
+        {(sample name, labels tuple): value}."""
+        merged = {}
+        files = [("sum", path) for path in glob.glob(os.path.join(self.directory, "sum_*.db"))]
+        files += [("max", path) for path in self._recent_seen_files()]
+        for kind, path in files:
+            for key, value in read_values(path):
+                name, labels = json.loads(key)
+                sample = (name, tuple(map(tuple, labels)))
+                if kind == "sum":
+                    merged[sample] = merged.get(sample, 0.0) + value
+                else:
+                    merged[sample] = max(merged.get(sample, value), value)
+        return merged
+
+
+# -------------------
+# EXPOSITION
+# -------------------
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_sample(name, labels, value):
+    if labels:
+        name += "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+    if value == int(value):
+        return f"{name} {int(value)}"
+    return f"{name} {value!r}"
+
+
+def _active_sessions(samples, now):
+    """{role: users} whose last request is recent and after any logout."""
+    logged_out = {labels: value for (name, labels), value in samples.items() if name == "crm_logged_out"}
+    active = dict.fromkeys(ROLES, 0)
+    for (name, labels), value in samples.items():
+        if name == "crm_last_seen" and now - value < SESSION_WINDOW and value > logged_out.get(labels, 0):
+            role = dict(labels)["role"]
+            active[role] = active.get(role, 0) + 1
+    return active
+
+
+def render(process_metrics):
+    """The text exposition of every metric."""
+    samples = process_metrics.collect()
+    by_metric = defaultdict(list)
+    for (name, labels), value in samples.items():
+        for suffix in ("_bucket", "_sum", "_count"):
+            base = name[:-len(suffix)]
+            if name.endswith(suffix) and METRICS.get(base, ("",))[0] == "histogram":
+                break
+        else:
+            base = name
+        if base in METRICS:
+            by_metric[base].append((name, labels, value))
+    by_metric["crm_active_sessions"] = [
+        ("crm_active_sessions", (("role", role),), users)
+        for role, users in _active_sessions(samples, time.time()).items()
+    ]
+
+    lines = []
+    for base, (kind, help_text) in METRICS.items():
+        lines.append(f"# HELP {base} {help_text}")
+        lines.append(f"# TYPE {base} {kind}")
+        for name, labels, value in sorted(by_metric[base], key=_sample_order):
+            lines.append(_format_sample(name, labels, value))
+    return "\n".join(lines) + "\n"
+
+
+def _sample_order(sample):
+    # Group a histogram's series together with buckets in ascending order
+    name, labels, _ = sample
+    others = tuple(item for item in labels if item[0] != "le")
+    le = dict(labels).get("le")
+    bound = float("inf") if le in (None, "+Inf") else float(le)
+    return others, name.rsplit("_", 1)[-1] != "bucket", bound, name
+
+
+# -------------------
+# FLASK INTEGRATION
+# -------------------
+def init_app(app):
+    """Record request samples and serve /metrics.
+
+    With METRICS_TOKEN set, /metrics requires ``Authorization: Bearer <token>``.
+    """
+    directory = app.config.get("METRICS_DIR") or app.config["DATABASE"] + "-metrics"
+    process_metrics = app.extensions["prometheus"] = ProcessMetrics(directory)
+
+    # Timed from pool.mark_request_start()
+    @app.after_request
+    def record_request(response):
+        endpoint = request.endpoint or "<unmatched>"
+        process_metrics.inc("crm_http_requests_total", endpoint=endpoint, method=request.method,
+                            status=str(response.status_code))
+        start = g.get("request_start")
+        if start is not None:
+            process_metrics.observe("crm_http_request_duration_seconds",
+                                    time.perf_counter() - start, endpoint=endpoint)
+        log = g.get("query_log")
+        if log is not None:
+            process_metrics.inc("crm_db_queries_total", log.count, endpoint=endpoint)
+            process_metrics.observe("crm_db_duration_seconds", log.seconds, endpoint=endpoint)
+        if session.get("role") in ROLES and session.get("user_id") is not None:
+            process_metrics.seen("crm_last_seen", time.time(), role=session["role"],
+                                 user=str(session["user_id"]))
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        token = app.config.get("METRICS_TOKEN")
+        if token and request.headers.get("Authorization") != f"Bearer {token}":
+            abort(401)
+        return Response(render(process_metrics), mimetype="text/plain; version=0.0.4")
+
+
+def _current():
+    return current_app.extensions.get("prometheus")
+
+
+def count_login(success, role=None):
+    """Count a login attempt (role is "unknown" for failures)."""
+    process_metrics = _current()
+    if process_metrics is not None:
+        process_metrics.inc("crm_logins_total", result="success" if success else "failure",
+                            role=role or "unknown")
+
+
+def count_query_abort(endpoint):
+    """Count a request stopped by its query deadline."""
+    process_metrics = _current()
+    if process_metrics is not None:
+        process_metrics.inc("crm_db_query_aborts_total", endpoint=endpoint)
+
+
+def count_logout(role, user_id):
+    """Stop counting the session of `user_id` as active."""
+    process_metrics = _current()
+    if process_metrics is not None and role in ROLES and user_id is not None:
+        process_metrics.seen("crm_logged_out", time.time(), role=role, user=str(user_id))
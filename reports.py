@@ -0,0 +1,237 @@
+# reports.py
+"""Report registry shared by the report preview and the CSV export.
+
+Each report declares its output columns, the SELECT(s) it reads from,
+the fields it can be filtered on and its sort key. run_report() pushes
+the filters into every source's WHERE clause as parameters, so a report
+built with the same set of filters always has the same SQL text: the
+preview and the export reuse one prepared statement from the
+connection's statement cache, and the date filter is an index range
+scan wherever the table has an epoch column (see timestamps.py).
+
+Preview results are cached by cached_report() under the data versions
+of the tables the report reads (see versions.py), so a cached preview
+is served until one of those tables is written.
+
+Adding a report means adding one register() call at the bottom.
+"""
+import sys
+from datetime import datetime, timedelta
+
+from cache import LRUCache
+from rollups import BUCKETS
+from timestamps import day_range_epochs
+from versions import read_versions
+
+REPORTS = {}
+
+RESULT_CACHE_ENTRIES = 256
+RESULT_CACHE_BYTES = 32 * 1024 * 1024
+
+_sql_cache = {}
+
+
+class Source:
+    """One SELECT feeding a report; a report with several is a UNION ALL.
+
+    ``date_column`` is what the date filter ranges over: an integer epoch
+    column when ``epoch`` is true, otherwise a text timestamp. ``columns``
+    maps filter names to this source's SQL expression for them, and
+    ``group_by`` makes it an aggregate.
+    """
+
+    def __init__(self, select, date_column, epoch=True, columns=None, group_by=None):
+        self.select = select
+        self.date_column = date_column
+        self.epoch = epoch
+        self.columns = columns or {}
+        self.group_by = group_by
+
+
+class Report:
+    def __init__(self, name, title, columns, sources, tables, filters=(), order_by="id"):
+        self.name = name
+        self.title = title
+        self.columns = columns
+        self.sources = sources
+        self.tables = tables
+        self.filters = filters
+        self.order_by = order_by
+
+    def sql(self, dated, filters):
+        """SQL text for this report with the given filters applied, built
+        once per combination and reused after that."""
+        key = (self.name, dated, filters)
+        if key not in _sql_cache:
+            selects = []
+            for source in self.sources:
+                where = []
+                if dated:
+                    where.append(f"{source.date_column} >= ? AND {source.date_column} < ?")
+                where += [f"{source.columns.get(name, name)} = ?" for name in filters]
+                clause = f" WHERE {' AND '.join(where)}" if where else ""
+                if source.group_by:
+                    clause += f" GROUP BY {source.group_by}"
+                selects.append(source.select.strip() + clause)
+            _sql_cache[key] = "\nUNION ALL\n".join(selects) + f"\nORDER BY {self.order_by}"
+        return _sql_cache[key]
+
+    def params(self, date_range, values):
+        params = []
+        for source in self.sources:
+            if date_range:
+                params += date_range[source.epoch]
+            params += values
+        return params
+
+
+def register(name, title, columns, sources, tables, filters=(), order_by="id"):
+    """Add a report; ``tables`` are the tables its result depends on."""
+    REPORTS[name] = Report(name, title, columns, sources, tables, filters, order_by)
+
+
+def filter_names():
+    """Every filter some report accepts, in registration order."""
+    names = []
+    for report in REPORTS.values():
+        names += [name for name in report.filters if name not in names]
+    return names
+
+
+def _date_range(start_date, end_date):
+    """Bounds for the text (index 0) and epoch (index 1) date filters."""
+    epochs = day_range_epochs(start_date, end_date)
+    if epochs is None:
+        return None
+    end = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
+    return (start_date, end.strftime("%Y-%m-%d")), epochs
+
+
+def run_report(conn, name, start_date=None, end_date=None, **values):
+    """Execute a report and return its cursor, or None for an unknown name.
+
+    ``start_date``/``end_date`` (YYYY-MM-DD, inclusive) filter on the
+    report's date column; keyword arguments filter on the report's
+    declared fields and are ignored when empty or not declared.
+    """
+    report = REPORTS.get(name)
+    if report is None:
+        return None
+    date_range = _date_range(start_date, end_date)
+    filters = tuple(field for field in report.filters if values.get(field))
+    return conn.execute(
+        report.sql(date_range is not None, filters),
+        report.params(date_range, [values[field] for field in filters]),
+    )
+
+
+# -------------------
+# RESULT CACHE
+# -------------------
+def _result_size(result):
+    """Rough in-memory size of a cached (rows, truncated) result."""
+    rows, _ = result
+    return sum(
+        sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row.values())
+        for row in rows
+    )
+
+
+result_cache = LRUCache(
+    max_entries=RESULT_CACHE_ENTRIES, max_bytes=RESULT_CACHE_BYTES, sizeof=_result_size
+)
+
+
+def cached_report(conn, name, limit, **filters):
+    """The first `limit` rows of a report as dicts, and whether it has more.
+
+    Results are keyed by report, filters and the current versions of the
+    report's tables, so a write to any of them makes the next call
+    recompute; unchanged reports are served from memory. Returns None
+    for an unknown report.
+    """
+    report = REPORTS.get(name)
+    if report is None:
+        return None
+    key = (name, limit, tuple(sorted(filters.items())), read_versions(conn, report.tables))
+    result = result_cache.get(key)
+    if result is None:
+        rows = run_report(conn, name, **filters).fetchmany(limit + 1)
+        result = ([dict(row) for row in rows[:limit]], len(rows) > limit)
+        result_cache.set(key, result)
+    return result
+
+
+# -------------------
+# REPORTS
+# -------------------
+register(
+    "customers", "Customer Report",
+    ["id", "fullname", "email", "phone", "gender", "occupation", "created_at"],
+    [Source("SELECT id, fullname, email, phone, gender, occupation, created_at FROM customers",
+            "created_epoch")],
+    tables=("customers",),
+    filters=("gender", "occupation"),
+    order_by="created_epoch, id",
+)
+
+register(
+    "users", "User Report",
+    ["username", "fullname", "email", "phone", "role", "created_at"],
+    [Source("SELECT username, fullname, email, phone, role, created_at FROM admins",
+            "created_at", epoch=False),
+     Source("SELECT username, fullname, email, phone, role, created_at FROM staff",
+            "created_at", epoch=False),
+     Source("SELECT username, fullname, email, phone, role, created_at FROM customers",
+            "created_epoch")],
+    tables=("admins", "staff", "customers"),
+    filters=("role",),
+    order_by="created_at",
+)
+
+register(
+    "sales", "Sales Report",
+    ["id", "customer", "product", "amount", "status", "created_at"],
+    [Source("""
+        SELECT t.id, c.fullname AS customer, t.type AS product, t.amount, t.status, t.created_at
+        FROM transactions t LEFT JOIN customers c ON c.id = t.customer_id
+    """, "t.created_epoch", columns={"status": "t.status", "product": "t.type"})],
+    tables=("transactions", "customers"),
+    filters=("status", "product"),
+    order_by="t.created_epoch, t.id",
+)
+
+register(
+    "reminders", "Reminder Report",
+    ["id", "title", "description", "reminder_date", "status", "created_at"],
+    [Source("SELECT id, title, description, reminder_date, status, created_at FROM reminders",
+            "created_epoch")],
+    tables=("reminders",),
+    filters=("status",),
+    order_by="created_epoch, id",
+)
+
+register(
+    "transactions", "Transaction Report",
+    ["id", "customer_id", "amount", "type", "status", "created_at"],
+    [Source("SELECT id, customer_id, amount, type, status, created_at FROM transactions",
+            "created_epoch", columns={"product": "type"})],
+    tables=("transactions",),
+    filters=("status", "product"),
+    order_by="created_epoch, id",
+)
+
+# Revenue totals per period, read from the transactions_daily rollup
+for bucket, label in [("day", "Daily"), ("week", "Weekly"), ("month", "Monthly")]:
+    register(
+        f"revenue_{bucket}", f"{label} Revenue Report",
+        ["period", "product", "status", "count", "total"],
+        [Source(f"""
+            SELECT {BUCKETS[bucket]} AS period, type AS product, status,
+                   SUM(count) AS count, ROUND(SUM(sum_amount), 2) AS total
+            FROM transactions_daily
+        """, "day", epoch=False, columns={"product": "type"}, group_by="1, 2, 3")],
+        tables=("transactions",),
+        filters=("status", "product"),
+        order_by="period, product, status",
+    )
@@ -0,0 +1,139 @@
+# rollups.py
+"""Daily transaction totals kept current by triggers.
+
+``transactions_daily`` holds one row per (day, type, status) with the
+number of transactions and their summed amount, so revenue views group
+a few rows per day instead of aggregating raw transactions. Days are
+local dates of ``created_epoch`` (see timestamps.py); a transaction is
+counted once its epoch is set. Triggers apply every insert, delete and
+change of amount, type, status or epoch; verify_rollups() compares the
+table against a full recompute and rebuild_rollups() replaces it.
+"""
+
+# Bucket -> SQL expression mapping a 'YYYY-MM-DD' day to its period start
+BUCKETS = {
+    "day": "day",
+    "week": "date(day, 'weekday 0', '-6 days')",  # Monday
+    "month": "strftime('%Y-%m-01', day)",
+}
+
+# Summed amounts drift by float rounding as rows come and go
+AMOUNT_TOLERANCE = 0.005
+
+
+def _key(row):
+    return (
+        f"date({row}.created_epoch, 'unixepoch', 'localtime')",
+        f"coalesce({row}.type, '')",
+        f"coalesce({row}.status, '')",
+    )
+
+
+def _add(row):
+    day, type_, status = _key(row)
+    return f"""
+        INSERT INTO transactions_daily (day, type, status, count, sum_amount)
+        SELECT {day}, {type_}, {status}, 1, coalesce({row}.amount, 0)
+        WHERE {row}.created_epoch IS NOT NULL
+        ON CONFLICT (day, type, status) DO UPDATE
+        SET count = count + 1, sum_amount = sum_amount + excluded.sum_amount;
+    """
+
+
+def _remove(row):
+    day, type_, status = _key(row)
+    match = f"day = {day} AND type = {type_} AND status = {status}"
+    return f"""
+        UPDATE transactions_daily
+        SET count = count - 1, sum_amount = sum_amount - coalesce({row}.amount, 0)
+        WHERE {match} AND {row}.created_epoch IS NOT NULL;
+        DELETE FROM transactions_daily WHERE {match} AND count <= 0;
+    """
+
+
+def install_rollups(conn):
+    """Create transactions_daily and its triggers, then fill it."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS transactions_daily (
+        day TEXT NOT NULL,
+        type TEXT NOT NULL,
+        status TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        sum_amount REAL NOT NULL,
+        PRIMARY KEY (day, type, status)
+    ) WITHOUT ROWID
+    """)
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_transactions_daily_insert AFTER INSERT ON transactions
+    BEGIN {_add("NEW")} END
+    """)
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_transactions_daily_delete AFTER DELETE ON transactions
+    BEGIN {_remove("OLD")} END
+    """)
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_transactions_daily_update
+    AFTER UPDATE OF amount, type, status, created_epoch ON transactions
+    BEGIN {_remove("OLD")} {_add("NEW")} END
+    """)
+    rebuild_rollups(conn)
+
+
+_RECOMPUTE = """
+    SELECT date(created_epoch, 'unixepoch', 'localtime') AS day,
+           coalesce(type, '') AS type, coalesce(status, '') AS status,
+           COUNT(*) AS count, coalesce(SUM(amount), 0) AS sum_amount
+    FROM transactions
+    WHERE created_epoch IS NOT NULL
+    GROUP BY 1, 2, 3
+"""
+
+
+def rebuild_rollups(conn):
+    """Replace transactions_daily with a full recompute."""
+    conn.execute("DELETE FROM transactions_daily")
+    conn.execute(f"INSERT INTO transactions_daily (day, type, status, count, sum_amount) {_RECOMPUTE}")
+
+
+def verify_rollups(conn):
+    """Compare transactions_daily against a full recompute.
+
+    Returns (key, stored, actual) for every (day, type, status) whose
+    (count, sum_amount) differs; an empty list means the rollup is exact.
+    """
+    def totals(sql):
+        return {tuple(row[:3]): (row[3], row[4]) for row in conn.execute(sql)}
+
+    stored = totals("SELECT day, type, status, count, sum_amount FROM transactions_daily")
+    actual = totals(_RECOMPUTE)
+    mismatches = []
+    for key in sorted(set(stored) | set(actual)):
+        have, want = stored.get(key, (0, 0.0)), actual.get(key, (0, 0.0))
+        if have[0] != want[0] or abs(have[1] - want[1]) > AMOUNT_TOLERANCE:
+            mismatches.append((key, have, want))
+    return mismatches
+
+
+def rollup_totals(conn, bucket="day", start_date=None, end_date=None, split=None):
+    """Transaction count and amount per day, week or month, oldest first.
+
+    ``start_date``/``end_date`` (YYYY-MM-DD, inclusive) bound the days;
+    ``split`` ("type" or "status") adds that column to the grouping.
+    Rows have ``period``, ``count`` and ``total`` (plus the split column).
+    """
+    period = BUCKETS[bucket]
+    columns = f"{period} AS period" + (f", {split}" if split in ("type", "status") else "")
+    where, params = [], []
+    if start_date:
+        where.append("day >= ?")
+        params.append(start_date)
+    if end_date:
+        where.append("day <= ?")
+        params.append(end_date)
+    clause = f"WHERE {' AND '.join(where)}" if where else ""
+    group = "period" + (f", {split}" if split in ("type", "status") else "")
+    return conn.execute(f"""
+        SELECT {columns}, SUM(count) AS count, ROUND(SUM(sum_amount), 2) AS total
+        FROM transactions_daily {clause}
+        GROUP BY {group} ORDER BY {group}
+    """, params).fetchall()
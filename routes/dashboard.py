@@ -1,23 +1,107 @@
 # routes/dashboard.py
 import sqlite3
 import hashlib
-from flask import Blueprint, render_template, session, redirect, url_for, flash, request
+from flask import Blueprint, current_app, render_template, send_from_directory, session, redirect, url_for, flash, request, jsonify
 from db import get_connection
+from pool import queued_writes, read_only, stream_with_connection, writes
+from conditional import conditional
+from pagination import chained_page, keyset_page, page_args, page_url
+from search import search_customers as run_customer_search
+import typeahead
+from stats import read_stats
+from timestamps import now_epoch
+from reports import REPORTS, cached_report, filter_names, result_cache, run_report
+from rollups import BUCKETS, rollup_totals
+from metrics import database_files, table_rows
+from writer import execute_write
+from deadlines import exceeded
+from aiodb import fetch_all, fetch_value, load
+from activity_log import entry_row, get_buffer
 
 dashboard_bp = Blueprint("dashboard", __name__, url_prefix="/dashboard")
-
-DB_NAME = "crm_app.db"  # adjust if needed
+dashboard_bp.add_app_template_global(page_url)
 
 
 def get_db_connection():
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    return conn
+    # Same pooled, request-scoped connection as db.get_connection(); it is
+    # handed back to the pool on teardown, so views don't close it.
+    return get_connection()
+
+
+# User listings page through each table in turn, ordered by (table, id)
+USER_TABLES = [("admin", "admins"), ("staff", "staff"), ("customer", "customers")]
+
+
+def user_sources(columns):
+    return [(role, f"SELECT {columns} FROM {table}") for role, table in USER_TABLES]
 
 
 # ========================
 # Role-based dashboards
 # ========================
+RECENT_ROWS = 5  # rows per "recent" list on the home dashboards
+
+
+def recent_activity(conn, buffer, limit):
+    """The `limit` newest activity rows as dicts, entries still in the
+    write-behind buffer first (as in db.get_activity_logs())."""
+    def read():
+        return fetch_all(conn, """
+            SELECT actor_type, actor_id, action, details, timestamp
+            FROM activity_logs
+            ORDER BY timestamp DESC
+            LIMIT ?
+        """, (limit,))
+
+    if buffer is None:
+        return [dict(row) for row in read()]
+    rows, pending = buffer.read_with_pending(read)
+    unflushed = [entry_row(entry) for entry in reversed(pending[-limit:])]
+    return (unflushed + [dict(row) for row in rows])[:limit]
+
+
+def admin_dashboard_calls():
+    # All counts come from the trigger-maintained stats row. The buffer is
+    # looked up here, as the calls may run on threads without an app context.
+    return {
+        "counts": (read_stats,),
+        "recent_logs": (recent_activity, get_buffer(), RECENT_ROWS),
+    }
+
+
+def customer_dashboard_calls(customer_id):
+    return {
+        "total_transactions": (fetch_value, "SELECT COUNT(*) FROM transactions WHERE customer_id = ?",
+                               (customer_id,)),
+        "pending_feedbacks": (fetch_value, """
+            SELECT COUNT(*) FROM feedback
+            WHERE customer_id = ? AND lower(coalesce(status, '')) = 'pending'
+        """, (customer_id,)),
+        "upcoming_reminders": (fetch_value, """
+            SELECT COUNT(*) FROM reminders
+            WHERE customer_id = ? AND reminder_date >= date('now') AND status = 'pending'
+        """, (customer_id,)),
+        "transactions": (fetch_all, """
+            SELECT id, amount, type, status, created_at FROM transactions
+            WHERE customer_id = ?
+            ORDER BY created_at DESC
+            LIMIT ?
+        """, (customer_id, RECENT_ROWS)),
+        "feedbacks": (fetch_all, """
+            SELECT message, status, created_at FROM feedback
+            WHERE customer_id = ?
+            ORDER BY created_at DESC
+            LIMIT ?
+        """, (customer_id, RECENT_ROWS)),
+        "reminders": (fetch_all, """
+            SELECT title, reminder_date FROM reminders
+            WHERE customer_id = ? AND reminder_date >= date('now') AND status = 'pending'
+            ORDER BY reminder_date
+            LIMIT ?
+        """, (customer_id, RECENT_ROWS)),
+    }
+
+
 @dashboard_bp.route("/")
 def dashboard():
     role = session.get("role")
@@ -25,60 +109,27 @@ def dashboard():
         flash("You must log in first.", "warning")
         return redirect(url_for("auth.login"))
 
+    # The home dashboards gather their independent queries concurrently
+    # (see aiodb.py)
     if role == "admin":
-        conn = get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT COUNT(*) FROM staff")
-        total_staff = cursor.fetchone()[0]
-
-        cursor.execute("SELECT COUNT(*) FROM customers")
-        total_customers = cursor.fetchone()[0]
-
-        try:
-            cursor.execute("SELECT COUNT(*) FROM leads")
-            total_leads = cursor.fetchone()[0]
-        except:
-            total_leads = 0
-
-        try:
-            cursor.execute("SELECT COUNT(*) FROM feedback WHERE status='pending'")
-            pending_feedback = cursor.fetchone()[0]
-        except:
-            pending_feedback = 0
-
-        try:
-            cursor.execute("""
-                SELECT actor_type, actor_id, action, details, timestamp
-                FROM system_logs
-                ORDER BY timestamp DESC
-                LIMIT 5
-            """)
-            logs = cursor.fetchall()
-            recent_logs = [
-                {"actor_type": row[0], "actor_id": row[1], "action": row[2], "details": row[3], "timestamp": row[4]}
-                for row in logs
-            ]
-        except:
-            recent_logs = []
-
-        conn.close()
-
+        data = load(admin_dashboard_calls())
+        counts = data["counts"]
         return render_template(
             "dashboard/dashboard_home.html",
             role=role,
-            total_staff=total_staff,
-            total_customers=total_customers,
-            total_leads=total_leads,
-            pending_feedback=pending_feedback,
-            recent_logs=recent_logs
+            total_staff=counts["total_staff"],
+            total_customers=counts["total_customers"],
+            total_leads=counts["total_leads"],
+            pending_feedback=counts["feedback_pending"],
+            recent_logs=data["recent_logs"]
         )
 
     elif role == "staff":
         return render_template("dashboard/staff_home.html", role=role)
 
     elif role == "customer":
-        return render_template("dashboard/customer_home.html", role=role)
+        data = load(customer_dashboard_calls(session.get("user_id")))
+        return render_template("dashboard/customer_home.html", role=role, **data)
 
     else:
         flash("Invalid role.", "danger")
@@ -95,11 +146,65 @@ def update_system():
 
 
 
+def monitor_snapshot():
+    """Request metrics plus the current pool, buffer, cache and database state."""
+    conn = get_db_connection()
+    db_pool = current_app.extensions["db_pool"]
+    readers = current_app.extensions.get("db_readers")
+    buffer = current_app.extensions.get("activity_log")
+    snapshot = current_app.extensions["metrics"].snapshot()
+    snapshot["pools"] = {"Writer" if readers else "Read-write": db_pool.stats()}
+    if readers:
+        snapshot["pools"]["Readers (mode=ro)"] = readers.stats()
+    adb = current_app.extensions.get("aiodb")
+    if adb:
+        snapshot["pools"]["Async workers"] = adb.pool.stats()
+    if buffer:
+        snapshot["pools"]["Activity log writer"] = buffer.pool.stats()
+    snapshot["activity_log"] = buffer.stats() if buffer else None
+    write_queue = current_app.extensions.get("write_queue")
+    snapshot["write_queue"] = write_queue.stats() if write_queue else None
+    snapshot["caches"] = {"Report results": result_cache.stats(), "Customer typeahead": typeahead.cache.stats()}
+    snapshot["database"] = database_files(
+        conn, db_pool.database, sum(stats["open"] for stats in snapshot["pools"].values())
+    )
+    slow_log = current_app.extensions.get("slow_queries")
+    snapshot["slow_queries"] = slow_log.recent() if slow_log else []
+    snapshot["slow_query_ms"] = slow_log.threshold * 1000 if slow_log else None
+    snapshot["profiles"] = current_app.extensions["profiles"].listing()
+    snapshot["tables"] = {
+        table: {"rows": rows, "source": source} for table, (rows, source) in table_rows(conn).items()
+    }
+    return snapshot
+
+
 @dashboard_bp.route("/monitor_system")
 def monitor_system():
+    if session.get("role") != "admin":
+        flash("Unauthorized access.", "danger")
+        return redirect(url_for("dashboard.dashboard"))
+    # A shell; its script builds the console from monitor_system_data
     return render_template("dashboard/monitor_system.html")
 
 
+# The numbers behind monitor_system, also for scraping
+@dashboard_bp.route("/monitor_system.json")
+def monitor_system_data():
+    if session.get("role") != "admin":
+        return jsonify({"error": "admin login required"}), 403
+    return jsonify(monitor_snapshot())
+
+
+# Stored request profile (collapsed stacks) for flamegraph tools
+@dashboard_bp.route("/profiles/<name>")
+def download_profile(name):
+    if session.get("role") != "admin":
+        flash("Unauthorized access.", "danger")
+        return redirect(url_for("dashboard.dashboard"))
+    return send_from_directory(current_app.extensions["profiles"].directory, name,
+                               mimetype="text/plain", as_attachment=True)
+
+
 # @dashboard_bp.route("/manage_customers")
 # def manage_customers():
 #     return render_template("dashboard/manage_customers.html")
@@ -117,7 +222,21 @@ def update_customer_profile():
 
 @dashboard_bp.route("/track_sales")
 def track_sales():
-    return render_template("dashboard/track_sales.html")
+    # Totals per period come from the transactions_daily rollup
+    bucket = request.args.get("bucket", "day")
+    if bucket not in BUCKETS:
+        bucket = "day"
+    start_date = request.args.get("start_date") or None
+    end_date = request.args.get("end_date") or None
+    totals = rollup_totals(get_db_connection(), bucket, start_date, end_date)
+    return render_template(
+        "dashboard/track_sales.html",
+        totals=totals,
+        bucket=bucket,
+        buckets=list(BUCKETS),
+        start_date=start_date,
+        end_date=end_date,
+    )
 
 
 
@@ -176,9 +295,9 @@ def manage_users():
                 )
             elif role == "customer":
                 cursor.execute("""
-                    INSERT INTO customers (username, password, fullname, email, phone, role)
-                    VALUES (?, ?, ?, ?, ?, ?)""",
-                    (username, password, fullname, email, phone, role)
+                    INSERT INTO customers (username, password, fullname, email, phone, role, created_epoch)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                    (username, password, fullname, email, phone, role, now_epoch())
                 )
 
             conn.commit()
@@ -186,22 +305,24 @@ def manage_users():
         except sqlite3.IntegrityError:
             flash("Error: Username or email already exists.", "danger")
 
-    # Fetch users from all tables
+    # Fetch one page of users across all tables
+    after, before, size = page_args()
+    page = chained_page(
+        conn, user_sources("id, username, fullname, email, phone"),
+        after=after, before=before, size=size
+    )
     users = []
-    for role, table in [("admin", "admins"), ("staff", "staff"), ("customer", "customers")]:
-        rows = cursor.execute(f"SELECT * FROM {table}").fetchall()
-        for row in rows:
-            users.append({
-                "id": row["id"],
-                "username": row["username"],
-                "fullname": row["fullname"],  # ✅ fixed: always fullname now
-                "email": row["email"],
-                "phone": row["phone"],
-                "role": role
-            })
-
-    conn.close()
-    return render_template("dashboard/manage_users.html", users=users)
+    for role, row in page:
+        users.append({
+            "id": row["id"],
+            "username": row["username"],
+            "fullname": row["fullname"],  # ✅ fixed: always fullname now
+            "email": row["email"],
+            "phone": row["phone"],
+            "role": role
+        })
+
+    return render_template("dashboard/manage_users.html", users=users, page=page)
 
 
 # ---------------------------
@@ -226,13 +347,11 @@ def edit_user(role, user_id):
         table = "customers"
     else:
         flash("Invalid role.", "danger")
-        conn.close()
         return redirect(url_for("dashboard.manage_users"))
 
     # fetch user row
     row = cursor.execute(f"SELECT * FROM {table} WHERE id=?", (user_id,)).fetchone()
     if not row:
-        conn.close()
         flash("User not found.", "danger")
         return redirect(url_for("dashboard.manage_users"))
 
@@ -263,13 +382,10 @@ def edit_user(role, user_id):
         except Exception as e:
             conn.rollback()
             flash(f"Error updating user: {e}", "danger")
-        finally:
-            conn.close()
 
         return redirect(url_for("dashboard.manage_users"))
 
     # GET -> show form
-    conn.close()
     return render_template("dashboard/edit_user.html", user=user, role=role)
 
 
@@ -295,8 +411,6 @@ def delete_user(role, user_id):
     except Exception as e:
         conn.rollback()
         flash(f"Error deleting user: {e}", "danger")
-    finally:
-        conn.close()
 
     return redirect(url_for("dashboard.manage_users"))
 
@@ -320,26 +434,30 @@ def assign_role():
         conn.commit()
         flash("Role updated successfully!", "success")
 
-    # Fetch users
+    # Fetch one page of users
+    after, before, size = page_args()
+    page = chained_page(
+        conn, user_sources("id, username, role"),
+        after=after, before=before, size=size
+    )
     users = []
-    for role_type, table in [("admin", "admins"), ("staff", "staff"), ("customer", "customers")]:
-        rows = cursor.execute(f"SELECT id, username, role FROM {table}").fetchall()
-        for row in rows:
-            users.append({
-                "id": row["id"],
-                "username": row["username"],
-                "role": row["role"],
-                "user_type": role_type
-            })
+    for role_type, row in page:
+        users.append({
+            "id": row["id"],
+            "username": row["username"],
+            "role": row["role"],
+            "user_type": role_type
+        })
 
-    conn.close()
-    return render_template("dashboard/assign_role.html", users=users)
+    return render_template("dashboard/assign_role.html", users=users, page=page)
 
 
 # ========================
 # Manage Customers
 # ========================
 @dashboard_bp.route("/manage_customers", methods=["GET", "POST"])
+@queued_writes
+@conditional(("customers",))
 def manage_customers():
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -354,17 +472,40 @@ def manage_customers():
         username = request.form.get("username")
         password = request.form.get("password")
 
-        cursor.execute("""
-            INSERT INTO customers (fullname, email, phone, address, gender, occupation, username, password, role)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (fullname, email, phone, address, gender, occupation, username, password, "customer"))
-
-        conn.commit()
+        execute_write("""
+            INSERT INTO customers (fullname, email, phone, address, gender, occupation, username, password, role, created_epoch)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (fullname, email, phone, address, gender, occupation, username, password, "customer", now_epoch()))
+        typeahead.cache.clear()
         flash("Customer added successfully!", "success")
 
-    customers = cursor.execute("SELECT * FROM customers").fetchall()
-    conn.close()
-    return render_template("dashboard/manage_customers.html", customers=customers)
+    after, before, size = page_args()
+    customers = keyset_page(
+        conn, "SELECT * FROM customers", ["id"],
+        after=after, before=before, size=size
+    )
+    return render_template("dashboard/manage_customers.html", customers=customers, page=customers)
+
+
+# Customer Typeahead (JSON, for customer pickers on forms)
+@dashboard_bp.route("/customer_typeahead")
+def customer_typeahead():
+    if session.get("role") not in ("admin", "staff"):
+        return jsonify([]), 403
+    prefix = request.args.get("q", "")
+    limit = request.args.get("limit", typeahead.RESULT_LIMIT, type=int)
+    return jsonify(typeahead.lookup_customers(get_db_connection(), prefix, limit))
+
+
+# Search Customers (ranked full-text matches)
+@dashboard_bp.route("/search_customers")
+def search_customers():
+    query = request.args.get("q", "").strip()
+    after, before, size = page_args()
+    customers = run_customer_search(get_db_connection(), query, after=after, before=before, size=size)
+    if customers is None:
+        return redirect(url_for("dashboard.manage_customers"))
+    return render_template("dashboard/manage_customers.html", customers=customers, page=customers, query=query)
 
 
 # Edit Customer
@@ -393,23 +534,23 @@ def edit_customer(customer_id):
         """, (fullname, email, phone, address, gender, occupation, customer_id))
 
         conn.commit()
-        conn.close()
+        typeahead.cache.clear()
         flash("Customer updated successfully!", "success")
         return redirect(url_for("dashboard.manage_customers"))
 
-    conn.close()
     return render_template("dashboard/edit_customer.html", customer=customer)
 
 
 # Delete Customer
 @dashboard_bp.route("/delete_customer/<int:customer_id>")
+@writes
 def delete_customer(customer_id):
     conn = get_db_connection()
     cursor = conn.cursor()
 
     cursor.execute("DELETE FROM customers WHERE id=?", (customer_id,))
     conn.commit()
-    conn.close()
+    typeahead.cache.clear()
 
     flash("Customer deleted successfully!", "success")
     return redirect(url_for("dashboard.manage_customers"))
@@ -419,6 +560,8 @@ def delete_customer(customer_id):
 # Schedule Reminder
 # ========================
 @dashboard_bp.route("/schedule_reminder", methods=["GET", "POST"])
+@queued_writes
+@conditional(("reminders", "customers"))
 def schedule_reminder():
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -429,163 +572,182 @@ def schedule_reminder():
         description = request.form.get("description")
         reminder_date = request.form.get("reminder_date")
 
-        cursor.execute("""
-            INSERT INTO reminders (customer_id, title, description, reminder_date)
-            VALUES (?, ?, ?, ?)
-        """, (customer_id if customer_id else None, title, description, reminder_date))
-        conn.commit()
+        execute_write("""
+            INSERT INTO reminders (customer_id, title, description, reminder_date, created_epoch)
+            VALUES (?, ?, ?, ?, ?)
+        """, (customer_id if customer_id else None, title, description, reminder_date, now_epoch()))
         flash("Reminder scheduled successfully!", "success")
 
-    # Customers for dropdown
-    customers = cursor.execute("SELECT id, fullname FROM customers").fetchall()
-
-    # Fetch reminders with customer names
-    reminders = cursor.execute("""
+    # Fetch one page of reminders with customer names, soonest first
+    after, before, size = page_args()
+    reminders = keyset_page(
+        conn,
+        """
         SELECT r.id, c.fullname, r.title, r.description, r.reminder_date, r.status
         FROM reminders r
         LEFT JOIN customers c ON r.customer_id = c.id
-        ORDER BY r.reminder_date ASC
-    """).fetchall()
+        """,
+        ["r.reminder_date", "r.id"],
+        after=after, before=before, size=size
+    )
 
-    conn.close()
-    return render_template("dashboard/schedule_reminder.html", customers=customers, reminders=reminders)
+    return render_template("dashboard/schedule_reminder.html", reminders=reminders, page=reminders)
 
 
 # Mark Reminder as Done
 @dashboard_bp.route("/complete_reminder/<int:reminder_id>")
+@writes
 def complete_reminder(reminder_id):
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute("UPDATE reminders SET status='completed' WHERE id=?", (reminder_id,))
     conn.commit()
-    conn.close()
     flash("Reminder marked as completed!", "success")
     return redirect(url_for("dashboard.schedule_reminder"))
 
 
 # Delete Reminder
 @dashboard_bp.route("/delete_reminder/<int:reminder_id>")
+@writes
 def delete_reminder(reminder_id):
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute("DELETE FROM reminders WHERE id=?", (reminder_id,))
     conn.commit()
-    conn.close()
     flash("Reminder deleted successfully!", "success")
     return redirect(url_for("dashboard.schedule_reminder"))
 
 import csv
+import io
 from flask import Response
 
+# Rows pulled per fetchmany() while streaming a CSV export
+CSV_BATCH_SIZE = 1000
+REPORT_TRUNCATED = "# TRUNCATED: the export didn't finish in time. Narrow your filter and try again."
+
+
+def stream_csv(cursor, batch_size=CSV_BATCH_SIZE):
+    """Yield an executed cursor's result as CSV text, one batch at a time.
+
+    The header goes out first, then each fetchmany() batch is written
+    through csv.writer into a single buffer that is emptied after every
+    yield, so memory stays flat however many rows the report has. If
+    the request's query deadline interrupts a fetch, the last line is
+    REPORT_TRUNCATED.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow([col[0] for col in cursor.description])
+    while True:
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+
+        try:
+            rows = cursor.fetchmany(batch_size)
+        except sqlite3.OperationalError as exc:
+            if not exceeded(exc):
+                raise
+            # Out of time mid-export: end with a marker rather than a
+            # silently short file
+            writer.writerow([REPORT_TRUNCATED])
+            yield buffer.getvalue()
+            break
+        if not rows:
+            break
+        writer.writerows(rows)
+
 # ========================
 # Generate Report
 # ========================
+# Rows shown in the HTML preview; the CSV export has them all
+PREVIEW_ROWS = 200
+# Shown when a report's query outruns its deadline (see deadlines.py)
+REPORT_TOO_LARGE = ("Report too large: it didn't finish in time. "
+                    "Narrow your filter (a shorter date range, a role or a status) and try again.")
+
+
+def report_filters(values):
+    """Report date range and field filters from form or query values."""
+    filters = {name: values.get(name) for name in filter_names() if values.get(name)}
+    start_date, end_date = values.get("start_date"), values.get("end_date")
+    if start_date and end_date:
+        filters.update(start_date=start_date, end_date=end_date)
+    return filters
+
+
 @dashboard_bp.route("/generate_report", methods=["GET", "POST"])
+@read_only
 def generate_report():
     conn = get_db_connection()
-    cursor = conn.cursor()
-    report_data, report_type = None, None
+    report_data, report_type, filters, truncated = None, None, {}, False
+    status = 200
 
     if request.method == "POST":
         report_type = request.form.get("report_type")
-        start_date = request.form.get("start_date")
-        end_date = request.form.get("end_date")
-
-        query = ""
-        params = []
-
-        if report_type == "customers":
-            query = "SELECT id, fullname, email, phone, gender, occupation, created_at FROM customers"
-        elif report_type == "users":
-            # Merge admins + staff + customers
-            query = """
-                SELECT username, fullname, email, phone, role, created_at FROM admins
-                UNION ALL
-                SELECT username, fullname, email, phone, role, created_at FROM staff
-                UNION ALL
-                SELECT username, fullname, email, phone, role, created_at FROM customers
-            """
-        elif report_type == "sales":
-            query = "SELECT id, customer_id, product, amount, status, created_at FROM sales"
-        elif report_type == "reminders":
-            query = "SELECT id, title, message, reminder_date, status, created_at FROM reminders"
-        elif report_type == "transactions":
-            query = "SELECT id, customer_id, amount, type, status, created_at FROM transactions"
-
-        # Apply date filter if provided
-        if start_date and end_date and query:
-            if "WHERE" in query:
-                query += " AND created_at BETWEEN ? AND ?"
-            else:
-                query += " WHERE created_at BETWEEN ? AND ?"
-            params.extend([start_date, end_date])
+        filters = report_filters(request.form)
 
-        if query:
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
-            report_data = [dict(row) for row in rows]
+        # Same statement as the CSV export; the preview reads only its head,
+        # and is served from the result cache until its tables change
+        try:
+            result = cached_report(conn, report_type, PREVIEW_ROWS, **filters)
+        except sqlite3.OperationalError as exc:
+            if not exceeded(exc):
+                raise
+            flash(REPORT_TOO_LARGE, "warning")
+            status = 422
+        else:
+            if result is not None:
+                report_data, truncated = result
 
-    conn.close()
     return render_template(
         "dashboard/generate_report.html",
+        reports=REPORTS,
+        filter_names=filter_names(),
         report_data=report_data,
-        report_type=report_type
-    )
+        report_type=report_type,
+        filters=filters,
+        truncated=truncated,
+    ), status
 
 
 # ========================
 # Download Report (CSV)
 # ========================
+def report_tables(report_type):
+    report = REPORTS.get(report_type)
+    return report.tables if report else None
+
+
 @dashboard_bp.route("/download_report/<report_type>")
+@conditional(report_tables)
 def download_report(report_type):
     conn = get_db_connection()
-    cursor = conn.cursor()
 
-    query = ""
-    if report_type == "customers":
-        query = "SELECT id, fullname, email, phone, gender, occupation, created_at FROM customers"
-    elif report_type == "users":
-        query = """
-            SELECT username, fullname, email, phone, role, created_at FROM admins
-            UNION ALL
-            SELECT username, fullname, email, phone, role, created_at FROM staff
-            UNION ALL
-            SELECT username, fullname, email, phone, role, created_at FROM customers
-        """
-    elif report_type == "sales":
-        query = "SELECT id, customer_id, product, amount, status, created_at FROM sales"
-    elif report_type == "reminders":
-        query = "SELECT id, title, message, reminder_date, status, created_at FROM reminders"
-    elif report_type == "transactions":
-        query = "SELECT id, customer_id, amount, type, status, created_at FROM transactions"
-
-    if not query:
+    try:
+        cursor = run_report(conn, report_type, **report_filters(request.args))
+    except sqlite3.OperationalError as exc:
+        if not exceeded(exc):
+            raise
+        flash(REPORT_TOO_LARGE, "warning")
+        return redirect(url_for("dashboard.generate_report"))
+    if cursor is None:
         flash("Invalid report type!", "danger")
         return redirect(url_for("dashboard.generate_report"))
 
-    cursor.execute(query)
-    rows = cursor.fetchall()
-    conn.close()
-
-    # Create CSV
-    si = []
-    writer = csv.writer(si.append)
-    if rows:
-        header = rows[0].keys()
-        si.append(",".join(header))
-        for row in rows:
-            si.append(",".join([str(val) if val is not None else "" for val in row]))
-
-    output = "\n".join(si)
-
+    # Stream the CSV; stream_with_connection keeps the request (and its pooled
+    # connection) alive until the last batch has been sent
     return Response(
-        output,
+        stream_with_connection(stream_csv(cursor)),
         mimetype="text/csv",
         headers={"Content-Disposition": f"attachment;filename={report_type}_report.csv"}
     )
 
 
 @dashboard_bp.route("/feedbacks", methods=["GET", "POST"])
+@queued_writes
+@conditional(("feedback",))
 def feedbacks():
     # Ensure only customers can access
     if session.get("role") != "customer":
@@ -599,11 +761,10 @@ def feedbacks():
         message = request.form.get("message")
         customer_id = session.get("user_id")
 
-        cursor.execute("""
-            INSERT INTO feedback (customer_id, message, status, handled_by, created_at)
-            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
-        """, (customer_id, message, "pending", None))
-        conn.commit()
+        execute_write("""
+            INSERT INTO feedback (customer_id, message, status, handled_by, created_at, created_epoch)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP, ?)
+        """, (customer_id, message, "pending", None, now_epoch()))
         flash("Feedback submitted successfully!", "success")
 
     # Fetch past feedbacks for this customer
@@ -614,12 +775,13 @@ def feedbacks():
         ORDER BY created_at DESC
     """, (session.get("user_id"),)).fetchall()
 
-    conn.close()
     return render_template("dashboard/customer_feedback.html", feedbacks=feedbacks)
 
 
 
 @dashboard_bp.route("/transactions", methods=["GET", "POST"])
+@queued_writes
+@conditional(("transactions",))
 def transactions():
     if session.get("role") != "customer":
         flash("Unauthorized access.", "danger")
@@ -641,11 +803,10 @@ def transactions():
         elif product_type not in products:
             flash("Invalid product selected.", "danger")
         else:
-            cursor.execute("""
-                INSERT INTO transactions (customer_id, amount, status, type, created_at)
-                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
-            """, (customer_id, float(amount), "pending", product_type))
-            conn.commit()
+            execute_write("""
+                INSERT INTO transactions (customer_id, amount, status, type, created_at, created_epoch)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP, ?)
+            """, (customer_id, float(amount), "pending", product_type, now_epoch()))
             flash("Transaction submitted successfully!", "success")
 
     # Fetch past transactions
@@ -656,5 +817,4 @@ def transactions():
         ORDER BY created_at DESC
     """, (customer_id,)).fetchall()
 
-    conn.close()
     return render_template("dashboard/customer_transactions.html", transactions=transactions, products=products)
@@ -0,0 +1,151 @@
+# search.py
+"""Full-text customer search on an FTS5 index.
+
+``customers_fts`` is an external-content FTS5 table over the customers'
+name, email, phone, address, occupation and notes. It stores only the
+index, reading column values back from ``customers``, and triggers keep
+it in sync. Searches are prefix queries ranked by bm25.
+"""
+import re
+
+from pagination import Page, encode_cursor
+
+FTS_TABLE = "customers_fts"
+SEARCH_COLUMNS = ("email", "phone", "address", "occupation", "notes")
+CANDIDATES = 1000  # matches bm25 scores per search; see search_customers()
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def name_column(conn):
+    # Databases built by the app use "fullname"; init_db() uses "name"
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(customers)")}
+    return "fullname" if "fullname" in columns else "name"
+
+
+def _indexed_columns(conn):
+    return (name_column(conn),) + SEARCH_COLUMNS
+
+
+def install_search(conn):
+    """Create the FTS5 index and its sync triggers, then build it."""
+    columns = _indexed_columns(conn)
+    names = ", ".join(columns)
+    new_values = ", ".join(f"NEW.{column}" for column in columns)
+    old_values = ", ".join(f"OLD.{column}" for column in columns)
+
+    conn.execute(f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        {names},
+        content='customers',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """)
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_{FTS_TABLE}_insert AFTER INSERT ON customers
+    BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, {names}) VALUES (NEW.id, {new_values});
+    END
+    """)
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_{FTS_TABLE}_delete AFTER DELETE ON customers
+    BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {names}) VALUES ('delete', OLD.id, {old_values});
+    END
+    """)
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_{FTS_TABLE}_update AFTER UPDATE OF {names} ON customers
+    BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {names}) VALUES ('delete', OLD.id, {old_values});
+        INSERT INTO {FTS_TABLE} (rowid, {names}) VALUES (NEW.id, {new_values});
+    END
+    """)
+    rebuild_search(conn)
+
+
+def rebuild_search(conn):
+    """Reindex every customer from the content table."""
+    conn.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def match_expression(text):
+    """Turn free text into an FTS5 query: every word as a quoted prefix,
+    all of them required. Returns None when there is nothing to search."""
+    tokens = _TOKEN.findall(text or "")
+    if not tokens:
+        return None
+    return " AND ".join(f'"{token}"*' for token in tokens)
+
+
+def candidate_floor(conn, expression, limit=CANDIDATES):
+    """Lowest rowid among the newest `limit` matches, or None when there
+    are no more than `limit` of them."""
+    row = conn.execute(f"""
+        SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ?
+        ORDER BY rowid DESC LIMIT 1 OFFSET ?
+    """, (expression, limit - 1)).fetchone()
+    return row[0] if row is not None else None
+
+
+def _window(key):
+    # Search cursors are [position, floor, ceiling]; anything else starts over
+    if key is not None and len(key) == 3 and all(isinstance(value, int) for value in key):
+        return key
+    return None
+
+
+def search_customers(conn, text, after=None, before=None, size=25):
+    """Ranked, paginated customer matches (best first).
+
+    Each row is a customers row (as a dict) plus its bm25 ``score``. bm25
+    has to score every match before the best can be picked, so a query
+    with more than CANDIDATES matches ranks only the newest CANDIDATES
+    of them (a rowid range FTS5 reads directly) and the page's
+    ``capped`` is set, for the view to ask for a narrower search.
+
+    The rowid window (floor and ceiling) is fixed when the first page is
+    served and carried in the cursors with the page's position in the
+    ranking. Customers added while paging stay out of it, and since any
+    insert rescales bm25 scores, pages are cut by position (at most
+    CANDIDATES deep) rather than by a score key. The page is cut from
+    the FTS index alone and only its rows are read from customers.
+    """
+    expression = match_expression(text)
+    if expression is None:
+        return None
+    window = _window(after) or _window(before)
+    if window is None:
+        floor = candidate_floor(conn, expression) or 0
+        ceiling = conn.execute("SELECT coalesce(max(id), 0) FROM customers").fetchone()[0]
+        start = 0
+    elif _window(after) is not None:
+        start, floor, ceiling = window
+    else:
+        end, floor, ceiling = window
+        start = max(0, end - size)
+    start = max(0, min(start, CANDIDATES))
+    rows = conn.execute(f"""
+        SELECT rowid, rank FROM {FTS_TABLE}
+        WHERE {FTS_TABLE} MATCH ? AND rowid BETWEEN ? AND ?
+        ORDER BY rank, rowid LIMIT ? OFFSET ?
+    """, (expression, floor, ceiling, size + 1, start)).fetchall()
+    page = Page(
+        rows[:size],
+        size,
+        next_cursor=encode_cursor([start + size, floor, ceiling]) if len(rows) > size else None,
+        prev_cursor=encode_cursor([start, floor, ceiling]) if start else None,
+    )
+    page.capped = CANDIDATES if floor else None
+    ids = [row["rowid"] for row in page.rows]
+    customers = {
+        row["id"]: row for row in conn.execute(
+            f"SELECT * FROM customers WHERE id IN ({', '.join('?' * len(ids))})", ids
+        )
+    } if ids else {}
+    page.rows = [
+        dict(customers[row["rowid"]], score=row["rank"])
+        for row in page.rows if row["rowid"] in customers
+    ]
+    return page
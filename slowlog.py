@@ -0,0 +1,110 @@
+# slowlog.py
+"""Slow-query log with query plans.
+
+A request statement whose execute and fetches take SLOW_QUERY_MS or
+longer (see instrument.QueryLog) is written as one JSON line to the
+"crm.slow_queries" logger, which has a rotating file at SLOW_QUERY_LOG
+(default ``<database>-slow.log``), and kept in a ring buffer shown on
+the monitoring page. Each entry has the normalized statement, its
+parameters reduced to type and length, the endpoint that ran it, its
+duration and its EXPLAIN QUERY PLAN. A plan with SCAN over a big table
+is usually the next index to add.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+from flask import has_request_context, request
+
+from instrument import normalize
+
+logger = logging.getLogger("crm.slow_queries")
+
+SLOW_QUERY_MS = 100
+RECENT = 200                    # entries kept for the monitoring page
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 5
+
+
+def redact(parameters):
+    """Parameters with each value replaced by its type (and length)."""
+    def one(value):
+        if value is None:
+            return None
+        if isinstance(value, (str, bytes)):
+            return f"<{type(value).__name__}:{len(value)}>"
+        return f"<{type(value).__name__}>"
+
+    if parameters is None:
+        return "<executemany>"
+    if isinstance(parameters, dict):
+        return {name: one(value) for name, value in parameters.items()}
+    return [one(value) for value in parameters]
+
+
+def explain(conn, sql, parameters):
+    """EXPLAIN QUERY PLAN of `sql` as indented lines."""
+    if parameters is None:
+        return []
+    try:
+        # Plain sqlite3 execute, so the plan lookup isn't itself instrumented
+        rows = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+    except sqlite3.Error as exc:
+        return [f"(no plan: {exc})"]
+    depth = {0: -1}
+    lines = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node] + detail)
+    return lines
+
+
+class SlowQueryLog:
+    """Threshold, ring buffer and log output for slow statements."""
+
+    def __init__(self, threshold_ms=SLOW_QUERY_MS, size=RECENT):
+        self.threshold = threshold_ms / 1000
+        self._recent = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.logged = 0
+
+    def report(self, conn, sql, parameters, seconds):
+        entry = {
+            "at": round(time.time()),
+            "endpoint": request.endpoint if has_request_context() else None,
+            "ms": round(seconds * 1000, 2),
+            "sql": normalize(sql),
+            "params": redact(parameters),
+            "plan": explain(conn, sql, parameters),
+        }
+        with self._lock:
+            self._recent.append(entry)
+            self.logged += 1
+        logger.warning(json.dumps(entry))
+
+    def recent(self):
+        """Entries in the ring buffer, newest first."""
+        with self._lock:
+            return list(reversed(self._recent))
+
+
+# -------------------
+# FLASK INTEGRATION
+# -------------------
+def init_app(app):
+    """Log slow request queries unless SLOW_QUERY_MS is None."""
+    threshold_ms = app.config.get("SLOW_QUERY_MS", SLOW_QUERY_MS)
+    if threshold_ms is None:
+        return
+    app.extensions["slow_queries"] = SlowQueryLog(threshold_ms, app.config.get("SLOW_QUERY_RECENT", RECENT))
+
+    path = app.config.get("SLOW_QUERY_LOG") or app.config["DATABASE"] + "-slow.log"
+    if not any(getattr(handler, "baseFilename", None) == os.path.abspath(path) for handler in logger.handlers):
+        handler = RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, delay=True)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logger.addHandler(handler)
@@ -0,0 +1,148 @@
+// static/js/monitor_system.js
+// Builds the monitor_system console from monitor_system.json, fetched on
+// load and every few seconds after that. The page itself is only a shell.
+(function () {
+    const monitor = document.getElementById("monitor");
+    const url = monitor.dataset.url;
+    const profileUrl = monitor.dataset.profileUrl;
+
+    function esc(value) {
+        return String(value === null || value === undefined ? "" : value).replace(/[&<>"']/g, function (c) {
+            return {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;"}[c];
+        });
+    }
+    function kb(n) {
+        return (n / 1024).toLocaleString("en-US", {minimumFractionDigits: 1, maximumFractionDigits: 1}) + " KB";
+    }
+    function pct(ratio) { return Math.round(ratio * 100) + "%"; }
+    function upto(ms, last) { return ms === null ? "&gt; " + last + " ms" : "≤ " + ms + " ms"; }
+    function time(epoch) { return esc(new Date(epoch * 1000).toLocaleTimeString()); }
+    function truncate(text, length) { return text.length > length ? text.slice(0, length - 3) + "..." : text; }
+    function cells(values) { return values.map(function (v) { return "<td>" + v + "</td>"; }).join(""); }
+    function rows(items, render, colspan, empty) {
+        return items.length ? items.map(render).join("") : '<tr><td colspan="' + colspan + '">' + empty + "</td></tr>";
+    }
+    function card(title, body) {
+        return '<div class="card mt-4"><div class="card-header bg-dark text-white">' + title + "</div>" +
+               '<div class="card-body">' + body + "</div></div>";
+    }
+    function table(head, body, cls) {
+        return '<table class="table ' + (cls || "table-striped table-sm") + '">' +
+               (head ? '<thead class="table-dark"><tr>' + head + "</tr></thead>" : "") +
+               "<tbody>" + body + "</tbody></table>";
+    }
+    function facts(pairs) {
+        return table("", pairs.map(function (p) { return "<tr><th>" + p[0] + "</th><td>" + p[1] + "</td></tr>"; }).join(""), "table-sm");
+    }
+
+    function render(m) {
+        const last = m.buckets_ms[m.buckets_ms.length - 1];
+        let html = '<p class="text-muted">This process, up ' + m.uptime_s + "s · " + m.requests + " requests · " +
+            m.rate_per_s.toFixed(2) + " req/s over the last minute · " + pct(m.db_share) +
+            " of request time in SQL · refreshes every 5s</p>";
+
+        html += card("<strong>Endpoints</strong>", table(
+            "<th>Endpoint</th><th>Requests</th><th>Errors</th><th title=\"Requests stopped by their query deadline\">Aborts</th>" +
+            "<th>Req/s</th><th>Avg</th><th>p50</th><th>p95</th><th>Max</th><th>Queries/req</th><th>DB share</th>" +
+            m.buckets_ms.map(function (b) { return '<th class="text-muted small">≤' + b + "</th>"; }).join("") +
+            '<th class="text-muted small">&gt;' + last + "</th>",
+            rows(Object.entries(m.endpoints), function (item) {
+                const e = item[1];
+                return "<tr>" + cells([
+                    esc(item[0]), e.requests, e.errors, e.aborts || "", e.rate_per_s.toFixed(2), e.avg_ms + " ms",
+                    upto(e.p50_ms, last), upto(e.p95_ms, last), e.max_ms + " ms", e.queries_per_request, pct(e.db_share),
+                ]) + e.histogram.map(function (n) { return '<td class="text-muted small">' + (n || "") + "</td>"; }).join("") + "</tr>";
+            }, 12 + m.buckets_ms.length, "No requests yet.")
+        ));
+
+        html += card("<strong>Slowest recent queries</strong>", table(
+            "<th>Time</th><th>Endpoint</th><th>Statement</th><th>Runs</th><th>Total</th>",
+            rows(m.slowest_queries, function (q) {
+                return '<tr><td class="text-nowrap">' + time(q.at) + "</td>" +
+                    cells([esc(q.endpoint), "<code>" + esc(truncate(q.sql, 300)) + "</code>", q.runs, q.ms + " ms"]) + "</tr>";
+            }, 5, "No queries recorded yet.")
+        ));
+
+        if (m.slow_query_ms !== null) {
+            html += card("<strong>Slow queries</strong> (≥ " + Math.round(m.slow_query_ms) + " ms)", table(
+                "<th>Time</th><th>Endpoint</th><th>Duration</th><th>Statement</th><th>Parameters</th><th>Query plan</th>",
+                rows(m.slow_queries, function (q) {
+                    return '<tr><td class="text-nowrap">' + time(q.at) + "</td>" +
+                        cells([esc(q.endpoint), q.ms + " ms", "<code>" + esc(truncate(q.sql, 300)) + "</code>"]) +
+                        '<td class="small">' + esc(q.params) + "</td>" +
+                        '<td><pre class="small mb-0">' + esc(q.plan.join("\n")) + "</pre></td></tr>";
+                }, 6, "No slow queries logged.")
+            ));
+        }
+
+        let connections = Object.entries(m.pools).map(function (item, i) {
+            const p = item[1];
+            return "<h6" + (i ? ' class="mt-3"' : "") + ">" + esc(item[0]) + "</h6>" + facts([
+                ["Pool size", p.size],
+                ["Open / in use / idle", p.open + " / " + p.in_use + " / " + p.idle],
+                ["Checkouts", p.checkouts],
+                ["Waited / timed out", p.waits + " / " + p.timeouts],
+                ["Wait avg / max", p.wait_avg_ms.toFixed(2) + " / " + p.wait_max_ms.toFixed(2) + " ms"],
+            ]);
+        }).join("");
+        const wq = m.write_queue;
+        if (wq) {
+            connections += '<h6 class="mt-3">Write queue</h6>' + facts([
+                ["Queued", wq.queue_depth],
+                ["Operations / commits", wq.operations + " / " + wq.batches],
+                ["Batch avg / max", wq.batch_avg.toFixed(1) + " / " + wq.batch_max],
+                ["Commit avg", wq.commit_avg_ms.toFixed(2) + " ms"],
+                ["Failed", wq.failed],
+            ]);
+        }
+        const al = m.activity_log;
+        if (al) {
+            connections += '<h6 class="mt-3">Activity log buffer</h6>' + facts([
+                ["Queued", al.queue_depth + " / " + al.max_queue],
+                ["Flushes / rows", al.flushes + " / " + al.flushed_rows],
+                ["Flush avg / max", al.flush_avg_ms.toFixed(2) + " / " + al.flush_max_ms.toFixed(2) + " ms"],
+                ["Blocked / inline / errors", al.blocked + " / " + al.inline_writes + " / " + al.errors],
+            ]);
+        }
+        const db = m.database;
+        const database = facts([
+            ["File", "<code>" + esc(db.path) + "</code>"],
+            ["Database", kb(db.db_bytes) + " (" + db.page_count + " pages of " + db.page_size + " B, " + db.freelist_count + " free)"],
+            ["WAL / shm", kb(db.wal_bytes) + " / " + kb(db.shm_bytes)],
+            ["Page cache", kb(db.page_cache_bytes) + " per connection, " + kb(db.page_cache_total_bytes) + " across open connections"],
+        ]) + '<h6 class="mt-3">Table rows</h6>' + table("", Object.entries(m.tables).map(function (item) {
+            return "<tr><th>" + esc(item[0]) + "</th><td>" + item[1].rows.toLocaleString("en-US") +
+                '</td><td class="text-muted small">' + esc(item[1].source) + "</td></tr>";
+        }).join(""), "table-sm");
+        html += '<div class="row"><div class="col-md-6">' + card("<strong>Connections</strong>", connections) +
+                '</div><div class="col-md-6">' + card("<strong>Database</strong>", database) + "</div></div>";
+
+        html += card("<strong>Request profiles</strong>",
+            '<p class="small text-muted mb-2">Add <code>?_profile=1</code> (or an <code>X-Profile: 1</code> header) to any page to profile it. ' +
+            "Files are collapsed stacks for flamegraph.pl, speedscope or inferno.</p>" +
+            table("<th>Time</th><th>Endpoint</th><th>Size</th><th></th>", rows(m.profiles, function (p) {
+                return '<tr><td class="text-nowrap">' + time(p.taken_at) + "</td>" + cells([
+                    esc(p.endpoint), kb(p.bytes),
+                    '<a href="' + esc(profileUrl.replace("__name__", encodeURIComponent(p.name))) + '">Download</a>',
+                ]) + "</tr>";
+            }, 4, "No profiles stored.")));
+
+        html += card("<strong>Caches</strong>", table(
+            "<th>Cache</th><th>Entries</th><th>Size</th><th>Hits</th><th>Misses</th><th>Hit ratio</th><th>Evictions</th>",
+            Object.entries(m.caches).map(function (item) {
+                const s = item[1];
+                return "<tr>" + cells([esc(item[0]), s.entries, kb(s.bytes), s.hits, s.misses, pct(s.hit_ratio), s.evictions]) + "</tr>";
+            }).join(""), "table-striped"));
+
+        monitor.innerHTML = html;
+    }
+
+    function refresh() {
+        if (document.hidden) return;
+        fetch(url, {credentials: "same-origin"})
+            .then(function (r) { return r.ok ? r.json() : null; })
+            .then(function (m) { if (m) render(m); });
+    }
+    refresh();
+    setInterval(refresh, 5000);
+})();
@@ -0,0 +1,106 @@
+# stats.py
+"""Dashboard counters kept exact by triggers.
+
+The admin dashboard reads every total from the single ``stats`` row
+(id = 1) instead of running COUNT(*) over each table. Triggers on the
+counted tables adjust the row on every insert, update and delete;
+rebuild_stats() recomputes it from scratch.
+"""
+
+# counter column -> (table, optional WHERE used when recounting)
+COUNTERS = {
+    "total_staff": ("staff", None),
+    "total_customers": ("customers", None),
+    "total_leads": ("leads", None),
+    "feedback_pending": ("feedback", "lower(coalesce(status, '')) = 'pending'"),
+    "feedback_resolved": ("feedback", "lower(coalesce(status, '')) = 'resolved'"),
+    "feedback_other": ("feedback", "lower(coalesce(status, '')) NOT IN ('pending', 'resolved')"),
+}
+
+
+def _feedback_delta(row, sign):
+    # Per-status increments for NEW/OLD row; comparisons evaluate to 0 or 1
+    status = f"lower(coalesce({row}.status, ''))"
+    return (
+        f"feedback_pending = feedback_pending {sign} ({status} = 'pending'), "
+        f"feedback_resolved = feedback_resolved {sign} ({status} = 'resolved'), "
+        f"feedback_other = feedback_other {sign} ({status} NOT IN ('pending', 'resolved'))"
+    )
+
+
+def install_stats(conn):
+    """Create the stats table and its triggers, then fill it."""
+    columns = ",\n".join(f"        {name} INTEGER NOT NULL DEFAULT 0" for name in COUNTERS)
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS stats (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+{columns}
+    )
+    """)
+
+    for column, table in [("total_staff", "staff"), ("total_customers", "customers"), ("total_leads", "leads")]:
+        conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_stats_{table}_insert AFTER INSERT ON {table}
+        BEGIN
+            UPDATE stats SET {column} = {column} + 1 WHERE id = 1;
+        END
+        """)
+        conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_stats_{table}_delete AFTER DELETE ON {table}
+        BEGIN
+            UPDATE stats SET {column} = {column} - 1 WHERE id = 1;
+        END
+        """)
+
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_stats_feedback_insert AFTER INSERT ON feedback
+    BEGIN
+        UPDATE stats SET {_feedback_delta("NEW", "+")} WHERE id = 1;
+    END
+    """)
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_stats_feedback_delete AFTER DELETE ON feedback
+    BEGIN
+        UPDATE stats SET {_feedback_delta("OLD", "-")} WHERE id = 1;
+    END
+    """)
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_stats_feedback_status AFTER UPDATE OF status ON feedback
+    BEGIN
+        UPDATE stats SET {_feedback_delta("OLD", "-")} WHERE id = 1;
+        UPDATE stats SET {_feedback_delta("NEW", "+")} WHERE id = 1;
+    END
+    """)
+
+    rebuild_stats(conn)
+
+
+def count_stats(conn):
+    """Recount every counter from the base tables."""
+    counts = {}
+    for name, (table, where) in COUNTERS.items():
+        sql = f"SELECT COUNT(*) FROM {table}"
+        if where:
+            sql += f" WHERE {where}"
+        counts[name] = conn.execute(sql).fetchone()[0]
+    return counts
+
+
+def rebuild_stats(conn):
+    """Overwrite the stats row with fresh counts; returns the counts."""
+    counts = count_stats(conn)
+    names = ", ".join(counts)
+    placeholders = ", ".join("?" * len(counts))
+    conn.execute(
+        f"INSERT OR REPLACE INTO stats (id, {names}) VALUES (1, {placeholders})",
+        list(counts.values()),
+    )
+    return counts
+
+
+def read_stats(conn):
+    """The stats row as a dict (all zeros if it has not been built)."""
+    row = conn.execute(f"SELECT {', '.join(COUNTERS)} FROM stats WHERE id = 1").fetchone()
+    if row is None:
+        return dict.fromkeys(COUNTERS, 0)
+    return dict(zip(COUNTERS, row))
@@ -0,0 +1,135 @@
+# timestamps.py
+"""Integer epoch columns beside the text timestamps.
+
+``created_at`` / ``timestamp`` hold text in mixed formats: local-time
+strings with microseconds (local_text()) from db.py and UTC
+CURRENT_TIMESTAMP strings from the routes, which neither sort nor
+compare reliably. Each table below gets an indexed INTEGER epoch column
+(Unix seconds) that date-range reports filter on instead.
+New rows set it directly; an insert trigger fills it from the text
+column for any writer that doesn't, and backfill_epochs() converts
+existing rows in batches.
+"""
+import time
+from datetime import datetime, timedelta
+
+# table -> (text column, epoch column)
+EPOCH_COLUMNS = {
+    "customers": ("created_at", "created_epoch"),
+    "transactions": ("created_at", "created_epoch"),
+    "feedback": ("created_at", "created_epoch"),
+    "reminders": ("created_at", "created_epoch"),
+    "activity_logs": ("timestamp", "timestamp_epoch"),
+}
+
+BACKFILL_BATCH = 5000
+
+# Text -> epoch in SQL. Local times from db.py carry a fractional second
+# (see local_text()); CURRENT_TIMESTAMP strings have none and are UTC.
+# Text that doesn't parse (or NULL) falls back to the current time, so
+# every row ends up with an epoch and is converted only once.
+_TO_EPOCH = """coalesce(CAST(CASE WHEN {column} LIKE '%.%'
+    THEN strftime('%s', {column}, 'utc')
+    ELSE strftime('%s', {column}) END AS INTEGER),
+    CAST(strftime('%s', 'now') AS INTEGER))"""
+
+
+def now_epoch():
+    return int(time.time())
+
+
+def to_epoch(value):
+    """Epoch seconds for a naive local datetime."""
+    return int(value.timestamp())
+
+
+def local_text(value):
+    """Text for a naive local datetime, always with microseconds.
+
+    sqlite3's default adapter uses str(), which drops a zero fraction,
+    and a local time without one reads as UTC in _TO_EPOCH.
+    """
+    return value.isoformat(" ", "microseconds")
+
+
+def install_epoch_columns(conn):
+    """Add and index the epoch columns, plus the insert fallback triggers."""
+    for table, (text_column, epoch_column) in EPOCH_COLUMNS.items():
+        columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if epoch_column not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {epoch_column} INTEGER")
+        conn.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{table}_{epoch_column}
+            ON {table} ({epoch_column})
+        """)
+        conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_{epoch_column} AFTER INSERT ON {table}
+        WHEN NEW.{epoch_column} IS NULL
+        BEGIN
+            UPDATE {table}
+            SET {epoch_column} = {_TO_EPOCH.format(column="NEW." + text_column)}
+            WHERE id = NEW.id;
+        END
+        """)
+
+
+def backfill_epochs(conn, batch_size=BACKFILL_BATCH):
+    """Fill NULL epoch columns from their text timestamps.
+
+    Walks each table by id in committed batches, so converting a large
+    table never holds the write lock for long. Rows whose text is missing
+    or unparseable get the current time, as in the insert trigger, so a
+    converted table is skipped on the next startup. Returns the number of
+    rows updated.
+
+    Rows written before local_text() whose local time fell on a whole
+    second have no fraction and are read as UTC; there's nothing in the
+    text to tell them apart.
+    """
+    updated = 0
+    for table, (text_column, epoch_column) in EPOCH_COLUMNS.items():
+        # Skip straight to the first unconverted row (the epoch index keeps
+        # NULLs together, in id order)
+        first = conn.execute(
+            f"SELECT min(id) FROM {table} WHERE {epoch_column} IS NULL"
+        ).fetchone()[0]
+        if first is None:
+            continue
+        last_id = first - 1
+        while True:
+            row = conn.execute(f"""
+                SELECT max(id), count(*) FROM (
+                    SELECT id FROM {table} WHERE id > ? ORDER BY id LIMIT ?
+                )
+            """, (last_id, batch_size)).fetchone()
+            if not row[1]:
+                break
+            cursor = conn.execute(f"""
+                UPDATE {table}
+                SET {epoch_column} = {_TO_EPOCH.format(column=text_column)}
+                WHERE id > ? AND id <= ? AND {epoch_column} IS NULL
+            """, (last_id, row[0]))
+            conn.commit()
+            updated += cursor.rowcount
+            last_id = row[0]
+    return updated
+
+
+def _parse_day(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
+
+def day_range_epochs(start_date, end_date):
+    """[start, end) epoch bounds covering the local days start_date..end_date
+    (YYYY-MM-DD, inclusive), or None if either is missing or invalid."""
+    start, end = _parse_day(start_date), _parse_day(end_date)
+    if start is None or end is None:
+        return None
+
+    def midnight(day):
+        return to_epoch(datetime(day.year, day.month, day.day))
+
+    return midnight(start), midnight(end + timedelta(days=1))
@@ -0,0 +1,70 @@
+# typeahead.py
+"""Customer typeahead: indexed prefix lookups on name, email and phone.
+
+Each field is searched with a range scan (``col >= prefix AND col <
+prefix + U+10FFFF``) on a NOCASE index, so a lookup touches only the
+matching index entries. Results for hot prefixes are kept in a small
+LRU cache; the customer pages clear it when they write, and anything
+else (other workers, user management) ages out within CACHE_TTL.
+"""
+from cache import LRUCache
+from search import name_column
+
+RESULT_LIMIT = 10
+MAX_RESULT_LIMIT = 50
+MIN_PREFIX = 1
+CACHE_ENTRIES = 512
+CACHE_TTL = 30  # seconds; bounds staleness from writes in other processes
+
+_HIGH = chr(0x10FFFF)
+
+cache = LRUCache(max_entries=CACHE_ENTRIES, ttl=CACHE_TTL)
+
+
+def install_typeahead_indexes(conn):
+    name = name_column(conn)
+    conn.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_customers_name_nocase
+        ON customers ({name} COLLATE NOCASE)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_customers_email_nocase
+        ON customers (email COLLATE NOCASE)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_customers_phone
+        ON customers (phone)
+    """)
+
+
+def lookup_customers(conn, prefix, limit=RESULT_LIMIT):
+    """Up to `limit` customers whose name, email or phone starts with
+    `prefix` (case-insensitive), name matches first."""
+    prefix = (prefix or "").strip()
+    limit = max(1, min(limit, MAX_RESULT_LIMIT))
+    if len(prefix) < MIN_PREFIX:
+        return []
+
+    key = (prefix.lower(), limit)
+    results = cache.get(key)
+    if results is not None:
+        return results
+
+    name = name_column(conn)
+    results, seen = [], set()
+    for column, collate in [(name, " COLLATE NOCASE"), ("email", " COLLATE NOCASE"), ("phone", "")]:
+        rows = conn.execute(f"""
+            SELECT id, {name} AS name, email, phone FROM customers
+            WHERE {column} >= ?{collate} AND {column} < ?{collate}
+            ORDER BY {column}{collate}
+            LIMIT ?
+        """, (prefix, prefix + _HIGH, limit)).fetchall()
+        for row in rows:
+            if row[0] not in seen and len(results) < limit:
+                seen.add(row[0])
+                results.append({"id": row[0], "name": row[1], "email": row[2], "phone": row[3]})
+        if len(results) >= limit:
+            break
+
+    cache.set(key, results)
+    return results
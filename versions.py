@@ -0,0 +1,95 @@
+# versions.py
+"""Per-table data versions for cache invalidation.
+
+``data_versions`` holds a counter per tracked table that triggers bump
+on every insert, update and delete, along with the time of that write.
+Anything derived from a table can remember the versions it was built
+from and is stale exactly when one of them has moved, whichever process
+made the write.
+
+SQLite triggers fire once per row, so a bulk write wraps itself in
+one_bump(): the table's row triggers are switched off for the statement
+and the version moves once at the end. The switch is set and cleared
+inside the writer's transaction, so no other connection ever sees it.
+"""
+from contextlib import contextmanager
+
+# activity_logs is left out: it is written on nearly every request and
+# nothing cached depends on it.
+TRACKED_TABLES = ("admins", "staff", "customers", "leads", "feedback", "reminders", "transactions")
+
+
+_EVENTS = ("INSERT", "UPDATE", "DELETE")
+
+_BUMP = """UPDATE data_versions
+    SET version = version + 1, updated_epoch = CAST(strftime('%s', 'now') AS INTEGER)
+    WHERE name = {table}"""
+
+
+def install_versions(conn):
+    """Create data_versions and the bump triggers."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS data_versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0,
+        updated_epoch INTEGER NOT NULL DEFAULT 0,
+        deferred INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    """)
+    for table in TRACKED_TABLES:
+        conn.execute("""
+            INSERT OR IGNORE INTO data_versions (name, version, updated_epoch)
+            VALUES (?, 0, CAST(strftime('%s', 'now') AS INTEGER))
+        """, (table,))
+        for event in _EVENTS:
+            conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_versions_{table}_{event.lower()} AFTER {event} ON {table}
+            WHEN (SELECT deferred FROM data_versions WHERE name = '{table}') = 0
+            BEGIN
+                {_BUMP.format(table=f"'{table}'")};
+            END
+            """)
+
+
+def drop_version_triggers(conn):
+    for table in TRACKED_TABLES:
+        for event in _EVENTS:
+            conn.execute(f"DROP TRIGGER IF EXISTS trg_versions_{table}_{event.lower()}")
+
+
+@contextmanager
+def one_bump(conn, table):
+    """Count the writes to `table` inside the block as one version bump.
+
+    `conn` must be the writing connection; the bump happens even if the
+    block fails, which at worst invalidates a cache needlessly.
+    """
+    if table not in TRACKED_TABLES:
+        yield
+        return
+    conn.execute("UPDATE data_versions SET deferred = 1 WHERE name = ?", (table,))
+    try:
+        yield
+    finally:
+        conn.execute("UPDATE data_versions SET deferred = 0 WHERE name = ?", (table,))
+        conn.execute(_BUMP.format(table="?"), (table,))
+
+
+def read_versions(conn, tables):
+    """Current versions of `tables`, as a tuple in the same order."""
+    placeholders = ", ".join("?" * len(tables))
+    versions = dict(conn.execute(
+        f"SELECT name, version FROM data_versions WHERE name IN ({placeholders})", tables
+    ).fetchall())
+    return tuple(versions.get(table, 0) for table in tables)
+
+
+def read_data_state(conn, tables):
+    """(versions, last write epoch) for `tables`; versions as in read_versions()."""
+    placeholders = ", ".join("?" * len(tables))
+    rows = {row[0]: (row[1], row[2]) for row in conn.execute(
+        f"SELECT name, version, updated_epoch FROM data_versions WHERE name IN ({placeholders})",
+        tables,
+    )}
+    versions = tuple(rows.get(table, (0, 0))[0] for table in tables)
+    return versions, max((rows.get(table, (0, 0))[1] for table in tables), default=0)
@@ -0,0 +1,208 @@
+# writer.py
+"""Single-writer queue with group commit.
+
+Request threads don't write to SQLite themselves. They submit a write
+operation, a function taking a connection, and wait on its Future. One
+background thread takes the first queued operation plus whatever else
+is already queued (up to ``max_batch``), without waiting for more, and
+runs the group in one BEGIN IMMEDIATE ... COMMIT on the writer
+connection. Operations submitted during a commit make up the next
+group, so batches only grow while writes are actually arriving. Each
+operation runs in its own savepoint, so one failing (say, a duplicate
+email) is rolled back alone and its caller gets the exception. Futures resolve only after the commit, so a caller that
+reads afterwards sees its write.
+
+With every hot write path going through one thread, writers in this
+process never contend for the SQLite write lock; they queue in memory
+instead of spinning in busy_timeout. Turn it on with WRITE_QUEUE = True
+where write throughput matters more than per-write latency.
+"""
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from flask import current_app, g, has_app_context
+
+from db import transaction
+
+MAX_BATCH = 256
+# Off by default: the queue commits more writes per second than the
+# writer pool, but each write waits longer (see bench/writes.py)
+WRITE_QUEUE = False
+RESULT_TIMEOUT = 30.0  # seconds a caller waits for its write
+
+_STOP = object()
+
+
+class WriteQueue:
+    """Background writer that group-commits submitted operations."""
+
+    def __init__(self, pool, max_batch=MAX_BATCH):
+        self.pool = pool
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self._batches = 0
+        self._operations = 0
+        self._failed = 0
+        self._batch_max = 0
+        self._commit_total = 0.0
+
+    def submit(self, operation, *args):
+        """Queue ``operation(conn, *args)``; returns a Future of its result."""
+        self._ensure_thread()
+        future = Future()
+        self._queue.put((future, operation, args))
+        return future
+
+    def run(self, operation, *args):
+        """submit() and wait for the result (or exception).
+
+        After RESULT_TIMEOUT the operation is cancelled if it hasn't
+        started, so a concurrent.futures.TimeoutError means it was never
+        written and is safe to retry. One already in a batch is waited
+        for instead.
+        """
+        future = self.submit(operation, *args)
+        try:
+            return future.result(RESULT_TIMEOUT)
+        except FutureTimeout:
+            if future.cancel():
+                raise
+            return future.result()
+
+    # --- writer thread ---
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.close)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            stopping = False
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+            if stopping:
+                return
+
+    def _commit(self, batch):
+        start = time.perf_counter()
+        outcomes = []
+        conn = None
+        try:
+            conn = self.pool.acquire()
+            conn.execute("BEGIN IMMEDIATE")
+            for future, operation, args in batch:
+                if not future.set_running_or_notify_cancel():
+                    outcomes.append(None)
+                    continue
+                conn.execute("SAVEPOINT write_op")
+                try:
+                    result = operation(conn, *args)
+                except Exception as exc:
+                    conn.execute("ROLLBACK TO write_op")
+                    conn.execute("RELEASE write_op")
+                    outcomes.append((False, exc))
+                else:
+                    conn.execute("RELEASE write_op")
+                    outcomes.append((True, result))
+            conn.commit()
+        except Exception as exc:
+            # The group didn't commit: every caller still waiting gets the error
+            if conn is not None and conn.in_transaction:
+                conn.rollback()
+            for future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            with self._lock:
+                self._failed += len(batch)
+            return
+        finally:
+            if conn is not None:
+                conn.close()
+
+        for (future, _, _), outcome in zip(batch, outcomes):
+            if outcome is None:
+                continue
+            ok, value = outcome
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+        with self._lock:
+            self._batches += 1
+            self._operations += len(batch)
+            self._failed += sum(1 for outcome in outcomes if outcome and not outcome[0])
+            self._batch_max = max(self._batch_max, len(batch))
+            self._commit_total += time.perf_counter() - start
+
+    def close(self):
+        """Finish what is queued and stop the writer thread."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout=10)
+
+    def stats(self):
+        """Queue depth and group-commit metrics."""
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "batches": self._batches,
+                "operations": self._operations,
+                "failed": self._failed,
+                "batch_avg": (self._operations / self._batches) if self._batches else 0.0,
+                "batch_max": self._batch_max,
+                "commit_avg_ms": (self._commit_total / self._batches * 1000) if self._batches else 0.0,
+            }
+
+
+# -------------------
+# FLASK INTEGRATION
+# -------------------
+def init_app(app):
+    """Serialize request writes through one thread when WRITE_QUEUE is set."""
+    if not app.config.get("WRITE_QUEUE", WRITE_QUEUE):
+        return
+    app.extensions["write_queue"] = WriteQueue(
+        app.extensions["db_pool"],
+        max_batch=app.config.get("WRITE_QUEUE_MAX_BATCH", MAX_BATCH),
+    )
+
+
+def run_write(operation, *args):
+    """Run ``operation(conn, *args)`` through the app's write queue.
+
+    Without a queue, or when this request already holds the writer
+    connection (which the queue would wait for), it runs in a
+    transaction on the request connection instead.
+    """
+    write_queue = current_app.extensions.get("write_queue") if has_app_context() else None
+    held = g.get("db_conn") if has_app_context() else None
+    if write_queue is None or (held is not None and not held.pool.readonly):
+        with transaction() as conn:
+            return operation(conn, *args)
+    return write_queue.run(operation, *args)
+
+
+def execute_write(sql, params=()):
+    """One write statement through run_write(); returns its lastrowid."""
+    return run_write(lambda conn: conn.execute(sql, params).lastrowid)